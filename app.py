@@ -1,371 +1,544 @@
-from flask import Flask, render_template, request, redirect, url_for
-import io
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for
+from markupsafe import Markup
 import base64
+import hmac
 import os
+import threading
+import time
+from importlib.metadata import version as package_version
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend to avoid display issues
-import matplotlib.pyplot as plt
-from sklearn.ensemble import RandomForestRegressor
+
+from artifacts import load_artifact
+from charts import (CHART_MODES, RenderPool, chart_mimetype, find_solar_max_min, render_chart,
+                    render_plot_png)
+from direct import fit_direct
+from engines import Engine, engine_params, make_engine, split_params
+from features import FEATURE_COLUMNS, append_features, create_features, training_arrays
+from flat_forest import FlatForest
+from forecast_table import ForecastTable
+from http_cache import available_encodings, cache_headers, compress, make_etag, pick_encoding
+from metrics import init_app as init_metrics, register_gauge, stage
+from model_registry import ModelRegistry
+from models import extend_forest, fit_forest
+from plot_cache import PlotCache
+from rollout import model_predictor, rollout
+from singleflight import SingleFlight
+from sunspot_data import APPEND_ENV, append_observations, load_dataset
+from uncertainty import BAND_PERCENTILES, ForecastBands, forecast_bands
 
 app = Flask(__name__)
+init_metrics(app)
+
+
+def _choice_setting(name, default, choices):
+    """Environment setting ``name`` if it is one of ``choices``, else ``default`` (with a warning)"""
+    value = os.environ.get(name, default)
+    if value not in choices:
+        print(f"Ignoring {name}={value!r}: expected one of {', '.join(choices)}; using {default!r}")
+        return default
+    return value
+
+
+MIN_YEAR = 1970
+MAX_YEAR = 2100  # Forecasts are precomputed up to this year
+DEFAULT_END_YEAR = 2039
+# Years of forecast shown by default once appended data runs past DEFAULT_END_YEAR
+DEFAULT_FORECAST_YEARS = 15
+# Processes used to roll the per-tree trajectories for prediction intervals
+BAND_JOBS = int(os.environ.get('SUNSPOT_BAND_JOBS', '1'))
+# Chart output mode when the request does not pick one with ?chart=
+DEFAULT_CHART_MODE = _choice_setting('SUNSPOT_CHART_MODE', 'png', CHART_MODES)
+# Seconds a request waits for an identical in-flight build or render
+COALESCE_TIMEOUT = float(os.environ.get('SUNSPOT_COALESCE_TIMEOUT', '60'))
+# How long browsers and CDNs may reuse a GET response without revalidating it
+HTTP_MAX_AGE = int(os.environ.get('SUNSPOT_HTTP_MAX_AGE', '300'))
+# 'recursive' rolls the model forward a year at a time; 'direct' predicts every
+# year at once with the multi-horizon model. Requests can pick with ?strategy=
+STRATEGIES = ('recursive', 'direct')
+DEFAULT_STRATEGY = _choice_setting('SUNSPOT_FORECAST_STRATEGY', 'recursive', STRATEGIES)
+# Model engine (see engines.py): forest, hgb or linear
+ENGINE = os.environ.get('SUNSPOT_ENGINE', 'forest')
+# Bearer token for POST /api/observations; the endpoint is disabled without one
+ADMIN_TOKEN = os.environ.get('SUNSPOT_ADMIN_TOKEN', '')
+# Trees added to the forest for each batch of appended observations
+APPEND_TREES = int(os.environ.get('SUNSPOT_APPEND_TREES', '10'))
 
 
 def load_data():
-    data = {
-        'Year': [1970, 1971, 1972, 1973, 1974, 1975, 1976, 1977, 1978, 1979,
-                 1980, 1981, 1982, 1983, 1984, 1985, 1986, 1987, 1988, 1989,
-                 1990, 1991, 1992, 1993, 1994, 1995, 1996, 1997, 1998, 1999,
-                 2000, 2001, 2002, 2003, 2004, 2005, 2006, 2007, 2008, 2009,
-                 2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019,
-                 2020, 2021, 2022, 2023, 2024],
-        'Sunspot_Number': [104.5, 66.6, 68.9, 38.0, 34.5, 15.5, 12.6, 27.5, 92.5, 155.4,
-                           154.6, 140.4, 115.9, 66.6, 45.9, 17.9, 13.4, 29.4, 100.2, 157.6,
-                           142.2, 145.8, 94.5, 54.7, 29.9, 17.5, 8.6, 21.6, 64.2, 93.4,
-                           119.6, 110.9, 104.1, 63.6, 40.4, 29.8, 15.2, 7.6, 2.9, 3.1,
-                           16.5, 55.7, 57.6, 64.7, 79.3, 69.8, 39.8, 28.6, 12.9, 6.2,
-                           24.7, 48.8, 78.1, 121.0, 136.0]
-    }
-    df = pd.DataFrame(data)
-    return df
-
-
-def create_features(df):
-    df_features = df.copy()
-    df_features['Cycle_Position'] = (df_features['Year'] - 1970) % 11
-    df_features['Years_Since_1970'] = df_features['Year'] - 1970
-    df_features['Cycle_Number'] = ((df_features['Year'] - 1970) // 11).astype(int)
-
-    for lag in [1, 2, 3, 4, 5]:
-        df_features[f'Lag_{lag}'] = df_features['Sunspot_Number'].shift(lag)
-
-    df_features['MA_3'] = df_features['Sunspot_Number'].rolling(window=3, min_periods=1).mean()
-    df_features['MA_5'] = df_features['Sunspot_Number'].rolling(window=5, min_periods=1).mean()
-    df_features['MA_11'] = df_features['Sunspot_Number'].rolling(window=11, min_periods=1).mean()
-
-    df_features['Sin_Cycle'] = np.sin(2 * np.pi * df_features['Cycle_Position'] / 11)
-    df_features['Cos_Cycle'] = np.cos(2 * np.pi * df_features['Cycle_Position'] / 11)
-
-    df_features['Trend'] = df_features['Years_Since_1970']
-    return df_features
-
-
-def train_model(df_features):
-    train_data = df_features.dropna()
-    X = train_data[['Cycle_Position', 'Years_Since_1970', 'Cycle_Number',
-                    'Lag_1', 'Lag_2', 'Lag_3', 'Lag_4', 'Lag_5',
-                    'MA_3', 'MA_5', 'MA_11', 'Sin_Cycle', 'Cos_Cycle', 'Trend']]
-    y = train_data['Sunspot_Number']
-
-    model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
-    model.fit(X, y)
-    return model
+    """Yearly sunspot data from $SUNSPOT_DATA (a SILSO CSV file) or the built-in series"""
+    return load_dataset(min_year=MIN_YEAR)
+
+
+def train_model(df_features, params=None):
+    """Fit the engine named by ``params['engine']``; the forest is kept as the plain sklearn model"""
+    X, y = training_arrays(df_features)
+    name, params = split_params(params)
+    if name == 'forest':
+        return fit_forest(X, y, params)
+    return make_engine(name, params).fit(X, y)
+
+
+def extend_model(entry, df):
+    """Model for ``df``, which appends years to ``entry.df``, without a full refit.
+
+    Only the new rows' features are computed. The forest gets APPEND_TREES
+    trees fitted on the whole grown series (warm start) and keeps its old
+    ones; the lighter engines are refitted. Once the forest has doubled its
+    configured size it is refitted from scratch, so the old trees do not
+    outweigh the new data forever.
+
+    Returns ``(df_features, model, tag)``; ``tag`` names the warm start so the
+    registry gives the grown forest its own key, and is None for refits.
+    """
+    tag = None
+    with stage('extend'):
+        df_features = append_features(entry.df_features, df)
+        X, y = training_arrays(df_features)
+        params = split_params(entry.params)[1]
+        model = entry.model
+        if isinstance(model, Engine):
+            model = model.update(X, y)
+        elif len(model.estimators_) + APPEND_TREES <= 2 * params.get('n_estimators', 100):
+            model = extend_forest(model, X, y, APPEND_TREES)
+            tag = f'extend-{APPEND_TREES}'
+        else:
+            model = fit_forest(X, y, params)
+    return df_features, model, tag
+
+
+# One fitted model per process, shared by every request. Set SUNSPOT_MODEL_DIR
+# to also keep the fitted model on disk so restarts and other workers reuse it.
+model_registry = ModelRegistry(create_features, train_model, engine_params(ENGINE),
+                               cache_dir=os.environ.get('SUNSPOT_MODEL_DIR'),
+                               cache_tag=f"sklearn{package_version('scikit-learn')}",
+                               timeout=COALESCE_TIMEOUT, extend=extend_model,
+                               on_replace=lambda entry: invalidate_caches(entry.key))
+
+
+def install_artifact(root):
+    """Serve the prebuilt artifact under ``root`` (see build_artifacts.py) without fitting.
+
+    The entry is registered under the artifact's model key, so it is only
+    used while the dataset and parameters still match what it was built from.
+    Returns the entry, or None if ``root`` holds no usable artifact.
+    """
+    artifact = load_artifact(root, FEATURE_COLUMNS)
+    if artifact is None:
+        return None
+    df = pd.DataFrame({'Year': np.array(artifact.history_years),
+                       'Sunspot_Number': np.array(artifact.history_values)})
+    entry = model_registry.install(artifact.key, df, create_features(df), artifact.params,
+                                   load_model=artifact.load_model)
+    entry.flat_forest = artifact.flat_forest
+    if artifact.metadata['max_year'] == MAX_YEAR:
+        entry.forecast = artifact.forecast
+        entry.bands = artifact.bands
+    return entry
+
+
+def get_model_entry():
+    """Return the shared fitted model for the current dataset"""
+    with stage('model'):
+        return model_registry.get(load_data())
 
 
 def predict_future_years(model, df_features, start_year, end_year):
-    base_df = df_features[['Year', 'Sunspot_Number']].copy()
-    current_data = base_df.copy()
-    preds = []
-    for year in range(start_year, end_year + 1):
-        cycle_pos = (year - 1970) % 11
-        years_since = year - 1970
-        cycle_num = (year - 1970) // 11
-
-        lag_vals = current_data['Sunspot_Number'].tail(5).values[::-1]
-        ma_3 = current_data['Sunspot_Number'].tail(3).mean()
-        ma_5 = current_data['Sunspot_Number'].tail(5).mean()
-        ma_11 = current_data['Sunspot_Number'].tail(11).mean() if len(current_data) >= 11 else current_data['Sunspot_Number'].mean()
-        sin_cycle = np.sin(2 * np.pi * cycle_pos / 11)
-        cos_cycle = np.cos(2 * np.pi * cycle_pos / 11)
-
-        features = np.array([[
-            cycle_pos, years_since, cycle_num,
-            lag_vals[0] if len(lag_vals) > 0 else current_data['Sunspot_Number'].iloc[-1],
-            lag_vals[1] if len(lag_vals) > 1 else current_data['Sunspot_Number'].iloc[-1],
-            lag_vals[2] if len(lag_vals) > 2 else current_data['Sunspot_Number'].iloc[-1],
-            lag_vals[3] if len(lag_vals) > 3 else current_data['Sunspot_Number'].iloc[-1],
-            lag_vals[4] if len(lag_vals) > 4 else current_data['Sunspot_Number'].iloc[-1],
-            ma_3, ma_5, ma_11, sin_cycle, cos_cycle, years_since
-        ]])
-
-        pred = float(model.predict(features)[0])
-        preds.append({'Year': year, 'Sunspot_Number': max(0.0, pred)})
-        current_data = pd.concat([current_data, pd.DataFrame({'Year': [year], 'Sunspot_Number': [pred]})], ignore_index=True)
-
-    return pd.DataFrame(preds)
+    """Predict sunspot numbers for start_year..end_year by rolling the model forward.
+
+    ``model`` can be the fitted forest or its ``FlatForest`` export.
+    """
+    with stage('rollout'):
+        years, values = rollout(model_predictor(model), df_features['Sunspot_Number'].to_numpy(),
+                                start_year, end_year)
+    return pd.DataFrame({'Year': years, 'Sunspot_Number': values})
 
 
 def predict_single_year(model, df_features, target_year):
     """Predict sunspot number for a single year"""
-    base_df = df_features[['Year', 'Sunspot_Number']].copy()
-    current_data = base_df.copy()
-    
     # If target year is in historical data, return it
-    if target_year <= 2024:
-        hist_data = current_data[current_data['Year'] == target_year]
+    last_year = int(df_features['Year'].max())
+    if target_year <= last_year:
+        hist_data = df_features[df_features['Year'] == target_year]
         if not hist_data.empty:
             return float(hist_data['Sunspot_Number'].iloc[0])
-    
+        return None
+
     # Otherwise predict up to target year
-    start_year = int(current_data['Year'].max()) + 1
-    if start_year <= target_year:
-        for year in range(start_year, target_year + 1):
-            cycle_pos = (year - 1970) % 11
-            years_since = year - 1970
-            cycle_num = (year - 1970) // 11
-
-            lag_vals = current_data['Sunspot_Number'].tail(5).values[::-1]
-            ma_3 = current_data['Sunspot_Number'].tail(3).mean()
-            ma_5 = current_data['Sunspot_Number'].tail(5).mean()
-            ma_11 = current_data['Sunspot_Number'].tail(11).mean() if len(current_data) >= 11 else current_data['Sunspot_Number'].mean()
-            sin_cycle = np.sin(2 * np.pi * cycle_pos / 11)
-            cos_cycle = np.cos(2 * np.pi * cycle_pos / 11)
-
-            features = np.array([[
-                cycle_pos, years_since, cycle_num,
-                lag_vals[0] if len(lag_vals) > 0 else current_data['Sunspot_Number'].iloc[-1],
-                lag_vals[1] if len(lag_vals) > 1 else current_data['Sunspot_Number'].iloc[-1],
-                lag_vals[2] if len(lag_vals) > 2 else current_data['Sunspot_Number'].iloc[-1],
-                lag_vals[3] if len(lag_vals) > 3 else current_data['Sunspot_Number'].iloc[-1],
-                lag_vals[4] if len(lag_vals) > 4 else current_data['Sunspot_Number'].iloc[-1],
-                ma_3, ma_5, ma_11, sin_cycle, cos_cycle, years_since
-            ]])
-
-            pred = float(model.predict(features)[0])
-            current_data = pd.concat([current_data, pd.DataFrame({'Year': [year], 'Sunspot_Number': [max(0.0, pred)]})], ignore_index=True)
-        
-        return float(current_data[current_data['Year'] == target_year]['Sunspot_Number'].iloc[0])
+    with stage('rollout'):
+        _, values = rollout(model_predictor(model), df_features['Sunspot_Number'].to_numpy(),
+                            last_year + 1, target_year, feed_clipped=True)
+    return float(values[-1])
+
+
+# Concurrent requests needing the same forecast, bands or chart share one computation
+flights = SingleFlight()
+
+
+def get_predictor(entry):
+    """Return the array-backed copy of ``entry``'s forest used for inference.
+
+    Other engines predict directly and are returned as they are. An installed
+    export is used as is, so an artifact's forest is never unpickled here.
+    """
+    if entry.flat_forest is not None:
+        return entry.flat_forest
+    if split_params(entry.params)[0] != 'forest':
+        return entry.model
+    entry.flat_forest = FlatForest.from_sklearn(entry.model)
+    return entry.flat_forest
+
+
+def predict_direct_years(model, df_features, start_year, end_year):
+    """Predict start_year..end_year in one call with a ``DirectForecaster``"""
+    with stage('direct'):
+        years, values = model.forecast(df_features['Sunspot_Number'].to_numpy(), start_year, end_year)
+    return pd.DataFrame({'Year': years, 'Sunspot_Number': values})
+
+
+def get_direct_model(entry):
+    """Return ``entry``'s direct multi-horizon model, fitting it on first use"""
+    def build():
+        if entry.direct is None:
+            with stage('fit_direct'):
+                entry.direct = fit_direct(entry.df['Year'].to_numpy(), entry.df['Sunspot_Number'].to_numpy(),
+                                          entry.params)
+        return entry.direct
+
+    if entry.direct is None:
+        return flights.do(('direct', entry.key), build, COALESCE_TIMEOUT)
+    return entry.direct
+
+
+def get_forecast(entry, strategy='recursive'):
+    """Return the forecast table for ``entry``, computing it once per strategy"""
+    if strategy == 'direct':
+        def build_direct():
+            if entry.direct_forecast is None:
+                entry.direct_forecast = ForecastTable.build(get_direct_model(entry), entry.df_features,
+                                                            MAX_YEAR, predict_direct_years)
+            return entry.direct_forecast
+
+        if entry.direct_forecast is None:
+            return flights.do(('direct-forecast', entry.key), build_direct, COALESCE_TIMEOUT)
+        return entry.direct_forecast
+
+    def build():
+        if entry.forecast is None:
+            entry.forecast = ForecastTable.build(get_predictor(entry), entry.df_features,
+                                                 MAX_YEAR, predict_future_years)
+        return entry.forecast
+
+    if entry.forecast is None:
+        return flights.do(('forecast', entry.key), build, COALESCE_TIMEOUT)
+    return entry.forecast
+
+
+def default_end_year(forecast):
+    """Last year shown when a request picks none: DEFAULT_END_YEAR, or later once appends pass it"""
+    return min(MAX_YEAR, max(DEFAULT_END_YEAR, forecast.first_year + DEFAULT_FORECAST_YEARS - 1))
+
+
+def get_bands(entry, strategy='recursive'):
+    """Return per-tree percentile bands for ``entry``'s forecast, computed once per strategy.
+
+    Returns None for engines without trees.
+    """
+    if split_params(entry.params)[0] != 'forest':
+        return None
+    if strategy == 'direct':
+        def build_direct():
+            if entry.direct_bands is None:
+                first_year = int(entry.df_features['Year'].max()) + 1
+                with stage('bands'):
+                    years, trees = get_direct_model(entry).tree_forecasts(
+                        entry.df_features['Sunspot_Number'].to_numpy(), first_year, MAX_YEAR)
+                    entry.direct_bands = ForecastBands(years, BAND_PERCENTILES,
+                                                       np.percentile(trees, BAND_PERCENTILES, axis=0))
+            return entry.direct_bands
+
+        if entry.direct_bands is None:
+            return flights.do(('direct-bands', entry.key), build_direct, COALESCE_TIMEOUT)
+        return entry.direct_bands
+
+    def build():
+        if entry.bands is None:
+            first_year = int(entry.df_features['Year'].max()) + 1
+            with stage('bands'):
+                entry.bands = forecast_bands(get_predictor(entry),
+                                             entry.df_features['Sunspot_Number'].to_numpy(),
+                                             first_year, MAX_YEAR, n_jobs=BAND_JOBS)
+        return entry.bands
+
+    if entry.bands is None:
+        return flights.do(('bands', entry.key), build, COALESCE_TIMEOUT)
+    return entry.bands
+
+
+def _wants_bands():
+    return request.values.get('bands', '').lower() in ('1', 'true', 'yes')
+
+
+def _strategy():
+    """Forecast strategy requested with ``strategy=``, else the default"""
+    strategy = request.values.get('strategy', '').lower()
+    return strategy if strategy in STRATEGIES else DEFAULT_STRATEGY
+
+
+def _chart_mode():
+    """Output mode requested with ``chart=`` (see ``charts.CHART_MODES``), else the default"""
+    mode = request.values.get('chart', '').lower()
+    return mode if mode in CHART_MODES else DEFAULT_CHART_MODE
+
+
+# Rendered charts only depend on the model/data version and end_year. Set
+# SUNSPOT_PLOT_CACHE_DIR to share renders between workers and restarts. Chart
+# keys already end in the output mode (.png, .svg, ...), so no suffix is added.
+plot_cache = PlotCache(max_entries=int(os.environ.get('SUNSPOT_PLOT_CACHE_SIZE', '256')),
+                       disk_dir=os.environ.get('SUNSPOT_PLOT_CACHE_DIR'), suffix='')
+
+# Charts render on a bounded pool of threads (or processes with
+# SUNSPOT_RENDER_POOL=process); the request thread waits for its result.
+render_pool = RenderPool(workers=int(os.environ.get('SUNSPOT_RENDER_WORKERS', '2')),
+                         kind=os.environ.get('SUNSPOT_RENDER_POOL', 'thread'),
+                         timeout=float(os.environ.get('SUNSPOT_RENDER_TIMEOUT', '30')))
+
+
+def _cache_counters():
+    plot = plot_cache.stats()
+    return {'cache="plot",result="hit"': plot['hits'],
+            'cache="plot",result="disk_hit"': plot['disk_hits'],
+            'cache="plot",result="miss"': plot['misses'],
+            'cache="model",result="hit"': model_registry.hits,
+            'cache="model",result="disk_hit"': model_registry.disk_loads,
+            'cache="model",result="miss"': model_registry.builds,
+            'cache="model",result="extended"': model_registry.extensions}
+
+
+def _cache_hit_ratios():
+    plot = plot_cache.stats()
+    ratios = {}
+    for cache, hits, total in (
+            ('plot', plot['hits'] + plot['disk_hits'], plot['hits'] + plot['disk_hits'] + plot['misses']),
+            ('model', model_registry.hits + model_registry.disk_loads,
+             model_registry.hits + model_registry.disk_loads + model_registry.builds)):
+        ratios[f'cache="{cache}"'] = hits / total if total else 0.0
+    return ratios
+
+
+def _coalescing_counters():
+    counters = {}
+    for name, flight in (('app', flights), ('model', model_registry.flight)):
+        stats = flight.stats()
+        for result in ('executed', 'shared', 'timeouts'):
+            counters[f'flight="{name}",result="{result}"'] = stats[result]
+    return counters
+
+
+register_gauge('sunspot_coalesced_calls_total', 'Single-flight calls by whether they ran, shared an in-flight '
+               'result or timed out waiting', _coalescing_counters, kind='counter')
+register_gauge('sunspot_cache_lookups_total', 'Cache lookups by cache and result', _cache_counters, kind='counter')
+register_gauge('sunspot_cache_hit_ratio', 'Fraction of cache lookups served without recomputing', _cache_hit_ratios)
+
+
+def get_chart(entry, future, end_year, show_bands=False, mode='png', strategy='recursive'):
+    """Return the chart for ``entry`` up to ``end_year`` in output ``mode``, rendering it at most once"""
+    key = (f'{entry.key}-{end_year}' + ('-bands' if show_bands else '')
+           + ('-direct' if strategy == 'direct' else '') + f'.{mode}')
+
+    def render():
+        band = None
+        bands = get_bands(entry, strategy) if show_bands else None
+        if bands is not None:
+            band_years, pct = bands.slice(MIN_YEAR, end_year)
+            band = (band_years, pct[BAND_PERCENTILES[0]], pct[BAND_PERCENTILES[-1]])
+        with stage('render'):
+            if mode in ('svg', 'client'):
+                # Plain string building; not worth a trip through the pool
+                data = render_chart(mode, entry.df[['Year', 'Sunspot_Number']], future, end_year, band)
+            else:
+                data = render_pool.render(entry.df[['Year', 'Sunspot_Number']], future, end_year, band, mode)
+        plot_cache.put(key, data)
+        return data
+
+    with stage('plot'):
+        data = plot_cache.get(key)
+        if data is None:
+            data = flights.do(('plot', key), render, COALESCE_TIMEOUT)
+        return data
+
+
+def get_plot_png(entry, future, end_year, show_bands=False):
+    """Return the full-resolution chart as base64 PNG"""
+    return base64.b64encode(get_chart(entry, future, end_year, show_bands)).decode('ascii')
+
+
+def _chart_context(entry, future, end_year, mode, show_bands, chart_param, strategy='recursive'):
+    """Template variables for the chart in output ``mode``, and whether rendering succeeded"""
+    context = {'chart_mode': mode, 'chart_mime': chart_mimetype(mode), 'chart_param': chart_param,
+               'plot_data': '', 'chart_markup': None}
+    try:
+        data = get_chart(entry, future, end_year, show_bands=show_bands, mode=mode, strategy=strategy)
+    except Exception as e:
+        print(f"Error generating plot: {e}")
+        return context, False
+    if mode in ('svg', 'client'):
+        # Generated by charts.py from numbers and fixed labels only
+        context['chart_markup'] = Markup(data.decode('utf-8'))
+    else:
+        context['plot_data'] = base64.b64encode(data).decode('ascii')
+    return context, True
+
+
+# Rendered pages (and their gzip/brotli variants), keyed by ETag. They live in
+# the same directory as the cached charts when SUNSPOT_PLOT_CACHE_DIR is set.
+page_cache = PlotCache(max_entries=int(os.environ.get('SUNSPOT_PAGE_CACHE_SIZE', '96')),
+                       disk_dir=os.environ.get('SUNSPOT_PLOT_CACHE_DIR'), suffix='')
+
+with open(os.path.join(app.root_path, 'templates', 'index.html'), 'rb') as _fh:
+    # Part of every page ETag, so a template change invalidates cached pages
+    PAGE_VERSION = make_etag(_fh.read())
+
+
+def invalidate_caches(model_key):
+    """Drop the rendered charts and pages of model version ``model_key``"""
+    dropped = plot_cache.discard_prefix(f'{model_key}-') + page_cache.discard_prefix(f'{model_key}-')
+    print(f"Dropped {dropped} cached charts and pages of superseded model {model_key}")
+
+
+def _cacheable():
+    return request.method in ('GET', 'HEAD')
+
+
+def _not_modified(etag, vary_encoding=False):
+    """304 response if the request is a GET that already has ``etag``, else None"""
+    if _cacheable() and request.if_none_match.contains_weak(etag):
+        return cache_headers(Response(status=304), etag, f'public, max-age={HTTP_MAX_AGE}', vary_encoding)
     return None
 
 
-def find_solar_max_min(combined_df, end_year):
-    """Find solar maximum and minimum years in the data"""
-    filtered_df = combined_df[combined_df['Year'] <= end_year].copy()
-    if filtered_df.empty or len(filtered_df) < 3:
-        return [], []
-    
-    maxima = []
-    minima = []
-    
-    # Find local maxima and minima
-    years = filtered_df['Year'].values
-    values = filtered_df['Sunspot_Number'].values
-    
-    # Look for peaks and valleys with a window approach
-    window = 3  # Look at 3 years on each side
-    
-    for i in range(window, len(years) - window):
-        # Check for local maximum - value should be higher than neighbors
-        is_max = True
-        for j in range(i - window, i + window + 1):
-            if j != i and values[j] >= values[i]:
-                is_max = False
-                break
-        
-        if is_max and values[i] > 40:  # Only mark significant peaks
-            maxima.append((int(years[i]), float(values[i])))
-        
-        # Check for local minimum - value should be lower than neighbors
-        is_min = True
-        for j in range(i - window, i + window + 1):
-            if j != i and values[j] <= values[i]:
-                is_min = False
-                break
-        
-        if is_min and values[i] < 25:  # Only mark significant valleys
-            minima.append((int(years[i]), float(values[i])))
-    
-    # Also check boundaries
-    if len(years) > 2:
-        # Check first point
-        if values[0] > values[1] and values[0] > 40:
-            maxima.append((int(years[0]), float(values[0])))
-        if values[0] < values[1] and values[0] < 25:
-            minima.append((int(years[0]), float(values[0])))
-        
-        # Check last point
-        if values[-1] > values[-2] and values[-1] > 40:
-            maxima.append((int(years[-1]), float(values[-1])))
-        if values[-1] < values[-2] and values[-1] < 25:
-            minima.append((int(years[-1]), float(values[-1])))
-    
-    # Remove duplicates and sort
-    maxima = list(set(maxima))
-    minima = list(set(minima))
-    maxima.sort(key=lambda x: x[1], reverse=True)
-    minima.sort(key=lambda x: x[1])
-    
-    # Return top 6 maxima and bottom 6 minima to avoid clutter
-    return maxima[:6], minima[:6]
-
-
-def render_plot_png(historical_df, predicted_df, end_year):
-    """Render plot from 1970 to end_year with 11-year cycle markers"""
-    # Set dark theme for matplotlib
-    plt.style.use('dark_background')
-    fig, ax = plt.subplots(figsize=(14, 7), facecolor='#0a0e27')
-    ax.set_facecolor('#0a0e27')
-
-    # Filter data up to end_year
-    hist_filtered = historical_df[historical_df['Year'] <= end_year].copy()
-    pred_filtered = predicted_df[predicted_df['Year'] <= end_year].copy()
-    
-    # Combine for finding max/min
-    combined_df = pd.concat([hist_filtered, pred_filtered], ignore_index=True).sort_values('Year')
-
-    # Plot historical data
-    if not hist_filtered.empty:
-        ax.plot(hist_filtered['Year'], hist_filtered['Sunspot_Number'], 
-                'o-', color='#4A90E2', linewidth=2.5, markersize=6, 
-                label='Historical Data', alpha=0.9, markerfacecolor='#6BB6FF')
-    
-    # Plot predicted data
-    if not pred_filtered.empty:
-        ax.plot(pred_filtered['Year'], pred_filtered['Sunspot_Number'], 
-                's--', color='#FF6B9D', linewidth=2.5, markersize=5, 
-                label='Predicted Data', alpha=0.9, markerfacecolor='#FF8FB3')
-
-    # Find and mark solar maxima and minima
-    maxima, minima = find_solar_max_min(combined_df, end_year)
-    
-    # Mark solar maxima
-    for year, value in maxima:
-        ax.scatter(year, value, s=400, color='#FFD700', marker='*', 
-                  edgecolors='#FFA500', linewidths=2.5, zorder=5, alpha=0.95)
-        # Get y limits after plotting for proper positioning
-        y_min, y_max = ax.get_ylim()
-        y_range = y_max - y_min
-        ax.annotate('Solar Maximum', xy=(year, value), 
-                   xytext=(year, value + y_range * 0.12),
-                   fontsize=11, fontweight='bold', color='#FFD700',
-                   ha='center', va='bottom',
-                   bbox=dict(boxstyle='round,pad=0.6', facecolor='#0a0e27', 
-                           edgecolor='#FFD700', linewidth=2, alpha=0.9),
-                   arrowprops=dict(arrowstyle='->', color='#FFD700', lw=2))
-    
-    # Mark solar minima
-    for year, value in minima:
-        ax.scatter(year, value, s=400, color='#00CED1', marker='v', 
-                  edgecolors='#20B2AA', linewidths=2.5, zorder=5, alpha=0.95)
-        # Get y limits after plotting for proper positioning
-        y_min, y_max = ax.get_ylim()
-        y_range = y_max - y_min
-        ax.annotate('Solar Minimum', xy=(year, value), 
-                   xytext=(year, value - y_range * 0.12),
-                   fontsize=11, fontweight='bold', color='#00CED1',
-                   ha='center', va='top',
-                   bbox=dict(boxstyle='round,pad=0.6', facecolor='#0a0e27', 
-                           edgecolor='#00CED1', linewidth=2, alpha=0.9),
-                   arrowprops=dict(arrowstyle='->', color='#00CED1', lw=2))
-
-    # Add 11-year cycle markers (vertical lines every 11 years starting from 1970)
-    cycle_start_year = 1970
-    i = 0
-    while True:
-        cycle_year = cycle_start_year + i * 11
-        if cycle_year > end_year:
-            break
-        ax.axvline(x=cycle_year, color='#4A5568', linestyle=':', alpha=0.5, linewidth=1.5)
-        i += 1
-
-    # Set x-axis ticks to show 11-year intervals
-    x_ticks = []
-    tick_year = 1970
-    while tick_year <= end_year:
-        x_ticks.append(tick_year)
-        tick_year += 11
-    
-    # Add end_year if not already in ticks
-    if end_year not in x_ticks:
-        x_ticks.append(end_year)
-    
-    ax.set_xticks(sorted(x_ticks))
-    ax.set_xlim(1970, end_year)
-
-    # Style axes for dark theme
-    ax.tick_params(colors='#E2E8F0')
-    ax.spines['bottom'].set_color('#4A5568')
-    ax.spines['top'].set_color('#4A5568')
-    ax.spines['right'].set_color('#4A5568')
-    ax.spines['left'].set_color('#4A5568')
-
-    ax.set_xlabel('Year (11-Year Solar Cycle Scale)', fontsize=12, fontweight='bold', color='#E2E8F0')
-    ax.set_ylabel('Sunspot Number', fontsize=12, fontweight='bold', color='#E2E8F0')
-    ax.set_title(f'Sunspot Number Prediction (1970–{end_year}) — 11-Year Solar Cycle', 
-                fontsize=14, fontweight='bold', pad=15, color='#E2E8F0')
-    ax.grid(True, linestyle='--', alpha=0.2, color='#4A5568')
-    ax.legend(loc='upper left', fontsize=10, framealpha=0.9, 
-             facecolor='#1a1f3a', edgecolor='#4A5568', labelcolor='#E2E8F0')
-
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format='png', dpi=160, facecolor='#0a0e27')
-    plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode('ascii')
+def _json_response(entry, payload):
+    """JSON response with an ETag from the model version and the full request URL"""
+    if not _cacheable():
+        return jsonify(payload())
+    etag = make_etag(entry.key, request.full_path)
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    return cache_headers(jsonify(payload()), etag, f'public, max-age={HTTP_MAX_AGE}')
+
+
+def _page_response(entry, etag, render):
+    """Serve ``entry``'s page for ``etag`` in the best encoding the client accepts.
+
+    ``render()`` returns ``(html, cacheable)``; it is only called when the page
+    is not cached yet. Every encoding is compressed once and stored, under
+    the model version so the pages go when the model is superseded. Pages
+    that are not cacheable (error pages) get ``no-store`` and no ETag.
+    """
+    encoding = pick_encoding(request)
+    name = f'{entry.key}-{etag}.html'
+    body = page_cache.get(f'{name}.{encoding}' if encoding else name)
+    ok = True
+    if body is None:
+        html, ok = render()
+        identity = html.encode('utf-8')
+        variants = {None: identity}
+        with stage('compress'):
+            for enc in available_encodings():
+                variants[enc] = compress(identity, enc)
+        if ok:
+            for enc, data in variants.items():
+                page_cache.put(f'{name}.{enc}' if enc else name, data)
+        body = variants[encoding]
+
+    response = Response(body, mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if not ok:
+        response.headers['Cache-Control'] = 'no-store'
+        response.vary.add('Accept-Encoding')
+        return response
+    cache_control = f'public, max-age={HTTP_MAX_AGE}' if _cacheable() else 'no-cache'
+    return cache_headers(response, etag, cache_control, vary_encoding=True)
 
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     try:
-        df = load_data()
-        df_features = create_features(df)
-        model = train_model(df_features)
+        entry = get_model_entry()
+        df = entry.df
+        strategy = _strategy()
+        forecast = get_forecast(entry, strategy)
+        first_year = forecast.first_year
         
         # Default values
         user_year = None
         predicted_value = None
-        end_year = 2039
+        end_year = default_end_year(forecast)
         
-        if request.method == 'POST':
+        # The year comes from the form (POST) or ?year= (GET, cacheable)
+        if request.method == 'POST' or 'year' in request.args:
             try:
-                user_year = int(request.form.get('year', ''))
-                if user_year < 1970:
-                    user_year = 1970
-                elif user_year > 2100:
-                    user_year = 2100
+                user_year = int(request.form.get('year', '') if request.method == 'POST'
+                                else request.args['year'])
+                if user_year < MIN_YEAR:
+                    user_year = MIN_YEAR
+                elif user_year > MAX_YEAR:
+                    user_year = MAX_YEAR
                 
-                # Predict for the user's year
-                predicted_value = predict_single_year(model, df_features, user_year)
+                # Look up the user's year in the precomputed forecast
+                predicted_value = forecast.value(user_year)
                 if predicted_value is not None:
                     end_year = user_year
                     
-                    # Generate predictions up to user's year
-                    if user_year > 2024:
-                        future = predict_future_years(model, df_features, 2025, user_year)
+                    # Predictions up to user's year
+                    if user_year >= first_year:
+                        future = forecast.frame(first_year, user_year)
                     else:
                         future = pd.DataFrame(columns=['Year', 'Sunspot_Number'])
                 else:
                     # If prediction failed, use defaults
-                    future = predict_future_years(model, df_features, 2025, 2039)
+                    future = forecast.frame(first_year, end_year)
             except (ValueError, TypeError) as e:
                 # Invalid input, use defaults
                 print(f"Error processing year input: {e}")
-                future = predict_future_years(model, df_features, 2025, 2039)
+                future = forecast.frame(first_year, end_year)
         else:
-            # Default: show predictions up to 2039
-            future = predict_future_years(model, df_features, 2025, 2039)
+            # Default: show predictions up to 2039 (or 15 years past the data)
+            future = forecast.frame(first_year, end_year)
         
         # Ensure future is a DataFrame
         if future.empty:
             future = pd.DataFrame(columns=['Year', 'Sunspot_Number'])
         
-        # Generate the plot
-        try:
-            img_b64 = render_plot_png(df[['Year', 'Sunspot_Number']], future, end_year)
-        except Exception as e:
-            print(f"Error generating plot: {e}")
-            # Return a simple error message or default plot
-            img_b64 = ""
-        
-        return render_template('index.html',
-                               historical=df.to_dict(orient='records'),
-                               future=future.to_dict(orient='records'),
-                               plot_data=img_b64,
-                               user_year=user_year,
-                               predicted_value=predicted_value,
-                               end_year=end_year)
+        mode = _chart_mode()
+        show_bands = _wants_bands()
+        chart_param = mode if 'chart' in request.values else None
+        strategy_param = strategy if 'strategy' in request.values else None
+        # Everything the page depends on, so the ETag is known before rendering
+        etag = make_etag(PAGE_VERSION, entry.key, user_year, end_year, mode, show_bands, chart_param,
+                         strategy, strategy_param)
+        not_modified = _not_modified(etag, vary_encoding=True)
+        if not_modified is not None:
+            return not_modified
+
+        def render():
+            # Generate the plot
+            chart, ok = _chart_context(entry, future, end_year, mode, show_bands, chart_param, strategy)
+            with stage('template'):
+                html = render_template('index.html',
+                                       historical=df.to_dict(orient='records'),
+                                       future=future.to_dict(orient='records'),
+                                       user_year=user_year,
+                                       predicted_value=predicted_value,
+                                       end_year=end_year,
+                                       strategy_param=strategy_param,
+                                       show_bands=show_bands,
+                                       **chart)
+            return html, ok
+
+        return _page_response(entry, etag, render)
     except Exception as e:
         print(f"Error in index route: {e}")
         import traceback
@@ -373,6 +546,201 @@ def index():
         return f"<h1>Error</h1><p>An error occurred: {str(e)}</p>", 500
 
 
+MAX_BATCH_YEARS = 1000
+
+
+def _parse_year(value, name):
+    """Parse a year query parameter, raising ValueError outside MIN_YEAR..MAX_YEAR"""
+    # int() would turn JSON true into 1 and silently truncate 2030.7
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"'{name}' must be an integer year, got {value!r}")
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer year, got {value!r}")
+    if year < MIN_YEAR or year > MAX_YEAR:
+        raise ValueError(f"'{name}' must be between {MIN_YEAR} and {MAX_YEAR}, got {year}")
+    return year
+
+
+def _forecast_records(entry, years, with_bands=False, strategy='recursive'):
+    forecast = get_forecast(entry, strategy)
+    bands = get_bands(entry, strategy) if with_bands else None
+    records = []
+    for year, value in zip(years, forecast.lookup(years)):
+        record = {'Year': year, 'Sunspot_Number': value,
+                  'Type': 'Historical' if year < forecast.first_year else 'Predicted'}
+        if with_bands:
+            pct = bands.at(year) if bands is not None else None
+            for p in (bands.percentiles if bands is not None else BAND_PERCENTILES):
+                record[f'P{p}'] = None if pct is None else pct[p]
+        records.append(record)
+    return records
+
+
+@app.route('/api/forecast', methods=['GET'])
+def api_forecast():
+    """Forecast for one year (?year=) or an inclusive range (?start=&end=) as JSON.
+
+    ``bands=1`` adds the per-tree percentile columns (P5/P50/P95) to each record.
+    ``strategy=direct`` answers from the direct multi-horizon model.
+    """
+    strategy = _strategy()
+    try:
+        entry = get_model_entry()
+        forecast = get_forecast(entry, strategy)
+        if 'year' in request.args:
+            years = [_parse_year(request.args['year'], 'year')]
+        else:
+            start = _parse_year(request.args.get('start', forecast.first_year), 'start')
+            end = _parse_year(request.args.get('end', default_end_year(forecast)), 'end')
+            if end < start:
+                raise ValueError(f"'end' ({end}) is before 'start' ({start})")
+            years = list(range(start, end + 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _json_response(entry, lambda: {'model_version': entry.key, 'strategy': strategy,
+                                          'forecast': _forecast_records(entry, years, _wants_bands(),
+                                                                        strategy)})
+
+
+@app.route('/api/forecast/batch', methods=['GET', 'POST'])
+def api_forecast_batch():
+    """Forecast for an arbitrary list of years.
+
+    GET takes ``?years=2030,2041,2052``; POST takes a JSON body
+    ``{"years": [2030, 2041, 2052]}``. Results keep the requested order.
+    ``bands=1`` (or ``"bands": true`` in the body) adds percentile columns;
+    ``strategy=direct`` (or ``"strategy": "direct"``) picks the direct model.
+    """
+    with_bands = _wants_bands()
+    strategy = _strategy()
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True)
+            if not isinstance(body, dict) or not isinstance(body.get('years'), list):
+                raise ValueError('POST body must be a JSON object with a "years" list')
+            raw_years = body['years']
+            with_bands = with_bands or bool(body.get('bands'))
+            if str(body.get('strategy', '')).lower() in STRATEGIES:
+                strategy = str(body['strategy']).lower()
+        else:
+            raw_years = [y for y in request.args.get('years', '').split(',') if y.strip()]
+        if not raw_years:
+            raise ValueError('No years requested')
+        if len(raw_years) > MAX_BATCH_YEARS:
+            raise ValueError(f'At most {MAX_BATCH_YEARS} years per batch, got {len(raw_years)}')
+        years = [_parse_year(y, 'years') for y in raw_years]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    entry = get_model_entry()
+    return _json_response(entry, lambda: {'model_version': entry.key, 'strategy': strategy,
+                                          'forecast': _forecast_records(entry, years, with_bands, strategy)})
+
+
+MAX_APPEND_YEARS = 100
+
+
+def _parse_observations(body, last_year):
+    """``(years, values)`` from an append request body, checked to continue the series"""
+    if not isinstance(body, dict) or not isinstance(body.get('observations'), list) or not body['observations']:
+        raise ValueError('Body must be a JSON object with a non-empty "observations" list')
+    if len(body['observations']) > MAX_APPEND_YEARS:
+        raise ValueError(f'At most {MAX_APPEND_YEARS} observations per request')
+    rows = []
+    for item in body['observations']:
+        if not isinstance(item, dict) or 'year' not in item or 'sunspot_number' not in item:
+            raise ValueError('Each observation needs "year" and "sunspot_number"')
+        try:
+            year, value = int(item['year']), float(item['sunspot_number'])
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid observation {item!r}')
+        if not np.isfinite(value) or value < 0:
+            raise ValueError(f'sunspot_number must be a non-negative number, got {item["sunspot_number"]!r}')
+        rows.append((year, value))
+    rows.sort()
+    years = [year for year, _ in rows]
+    expected = list(range(last_year + 1, last_year + 1 + len(years)))
+    if years != expected:
+        raise ValueError(f'Observations must be consecutive years starting at {last_year + 1}, got {years}')
+    if years[-1] >= MAX_YEAR:
+        raise ValueError(f'Observations must be before {MAX_YEAR}')
+    return years, [value for _, value in rows]
+
+
+_append_lock = threading.Lock()
+
+
+@app.route('/api/observations', methods=['POST'])
+def api_append_observations():
+    """Append new yearly observations and update the model without a full refit.
+
+    Takes ``{"observations": [{"year": 2025, "sunspot_number": 118.3}, ...]}``
+    with ``Authorization: Bearer $SUNSPOT_ADMIN_TOKEN``. The years must follow
+    the last year in the data. The response has the new and previous model
+    versions. The forecast is rebuilt before it returns.
+
+    Requires ``SUNSPOT_APPEND_LOG``: appends kept in one worker's memory would
+    never reach the other workers, so without the shared log the endpoint
+    answers 503.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Appending observations is disabled (SUNSPOT_ADMIN_TOKEN is not set)'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {ADMIN_TOKEN}'.encode('utf-8')):
+        return jsonify({'error': 'Invalid or missing admin token'}), 401
+    if not os.environ.get(APPEND_ENV):
+        return jsonify({'error': f'Appending observations needs a shared log ({APPEND_ENV} is not set)'}), 503
+
+    with _append_lock:
+        previous = get_model_entry()
+        try:
+            years, values = _parse_observations(request.get_json(silent=True),
+                                                int(previous.df['Year'].max()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        append_observations(years, values)
+        start = time.perf_counter()
+        entry = get_model_entry()
+        get_forecast(entry)
+    return jsonify({'model_version': entry.key, 'previous_version': previous.key, 'appended': years,
+                    'last_year': int(entry.df['Year'].max()),
+                    'update_seconds': round(time.perf_counter() - start, 4)})
+
+
+def warm(plots=False):
+    """Fit (or load) the model and build the forecast now instead of on the first request.
+
+    With ``plots=True`` the default chart is rendered into the plot cache as
+    well, which also imports matplotlib.
+    """
+    entry = get_model_entry()
+    forecast = get_forecast(entry)
+    if plots:
+        end_year = default_end_year(forecast)
+        future = forecast.frame(forecast.first_year, end_year)
+        if future.empty:
+            future = pd.DataFrame(columns=['Year', 'Sunspot_Number'])
+        get_plot_png(entry, future, end_year)
+
+
+# Start from a prebuilt artifact when one is configured, so nothing is fitted
+if os.environ.get('SUNSPOT_ARTIFACT_DIR'):
+    try:
+        install_artifact(os.environ['SUNSPOT_ARTIFACT_DIR'])
+    except Exception as e:
+        print(f"Could not load model artifact, will fit instead: {e}")
+
+# Fit the model at import time so the first request does not pay for it.
+# Set SUNSPOT_WARM_ON_IMPORT=0 to defer the fit to the first request instead.
+if os.environ.get('SUNSPOT_WARM_ON_IMPORT', '1') != '0':
+    try:
+        warm()
+    except Exception as e:
+        print(f"Model warm-up failed, will retry on first request: {e}")
+
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("Sunspot Prediction Web Application")
@@ -0,0 +1,149 @@
+"""
+Prebuilt model artifacts for fast cold starts.
+
+Fitting the forest and rolling the forecast forward is the slowest part of
+starting the app, and serverless functions pay it on every cold start. A build
+step (``build_artifacts.py``) does that work once and writes the result to a
+versioned directory:
+
+    artifacts/
+        CURRENT                  name of the artifact to serve
+        v1-<model key>/
+            metadata.json        format, model key, params, feature columns, versions
+            model.pkl            the fitted scikit-learn forest
+            forest_*.npy         FlatForest node arrays
+            history_*.npy        the observed series the model was fitted on
+            forecast.npy         the precomputed forecast
+            bands.npy            percentile bands (optional)
+
+Arrays are plain ``.npy`` files and are memory-mapped on load, so starting from
+an artifact costs a few file opens instead of a fit. The pickled model is only
+unpickled if something asks for it.
+"""
+import json
+import os
+import pickle
+import platform
+import shutil
+import time
+
+import numpy as np
+
+from flat_forest import FlatForest
+from forecast_table import ForecastTable
+from uncertainty import ForecastBands
+
+ARTIFACT_FORMAT = 1
+CURRENT_FILE = 'CURRENT'
+_FOREST_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+class Artifact:
+    """Everything loaded from one artifact directory"""
+
+    def __init__(self, path, metadata, history_years, history_values, flat_forest, forecast, bands):
+        self.path = path
+        self.metadata = metadata
+        self.key = metadata['key']
+        self.params = metadata['params']
+        self.history_years = history_years
+        self.history_values = history_values
+        self.flat_forest = flat_forest
+        self.forecast = forecast
+        self.bands = bands
+
+    def load_model(self):
+        """Unpickle the fitted forest; only needed to refit or re-export it"""
+        with open(os.path.join(self.path, 'model.pkl'), 'rb') as fh:
+            return pickle.load(fh)
+
+
+def save_artifact(root, entry, flat_forest, forecast, bands=None, feature_columns=(), max_year=None):
+    """Write ``entry`` and its derived data under ``root`` and make it CURRENT.
+
+    Returns the artifact directory. The directory is written under a
+    temporary name and renamed, so a reader never sees a partial artifact.
+    """
+    name = f'v{ARTIFACT_FORMAT}-{entry.key}'
+    path = os.path.join(root, name)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(tmp_path)
+
+    for attr in _FOREST_ARRAYS:
+        np.save(os.path.join(tmp_path, f'forest_{attr}.npy'), getattr(flat_forest, attr))
+    np.save(os.path.join(tmp_path, 'history_years.npy'), entry.df['Year'].to_numpy(dtype=np.int64))
+    np.save(os.path.join(tmp_path, 'history_values.npy'), entry.df['Sunspot_Number'].to_numpy(dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'forecast.npy'), forecast.values)
+    if bands is not None:
+        np.save(os.path.join(tmp_path, 'bands.npy'), bands.values)
+    with open(os.path.join(tmp_path, 'model.pkl'), 'wb') as fh:
+        pickle.dump(entry.model, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    import sklearn
+    metadata = {
+        'format': ARTIFACT_FORMAT,
+        'key': entry.key,
+        'params': entry.params,
+        'feature_columns': list(feature_columns),
+        'forest': {'max_depth': flat_forest.max_depth, 'n_features': flat_forest.n_features},
+        'first_year': forecast.first_year,
+        'last_year': forecast.last_year,
+        'max_year': forecast.last_year if max_year is None else max_year,
+        'band_percentiles': None if bands is None else list(bands.percentiles),
+        'versions': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'sklearn': sklearn.__version__},
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    with open(os.path.join(tmp_path, 'metadata.json'), 'w', encoding='utf-8') as fh:
+        json.dump(metadata, fh, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    current_tmp = os.path.join(root, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(current_tmp, 'w', encoding='utf-8') as fh:
+        fh.write(name + '\n')
+    os.replace(current_tmp, os.path.join(root, CURRENT_FILE))
+    return path
+
+
+def load_artifact(root, feature_columns=None):
+    """Load the CURRENT artifact under ``root``, or None if there is no usable one.
+
+    Artifacts written by another format version, or for a different feature
+    set than ``feature_columns``, are ignored so the caller falls back to
+    fitting.
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r', encoding='utf-8') as fh:
+            path = os.path.join(root, fh.read().strip())
+        with open(os.path.join(path, 'metadata.json'), 'r', encoding='utf-8') as fh:
+            metadata = json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+    if metadata.get('format') != ARTIFACT_FORMAT:
+        print(f"Ignoring artifact {path}: format {metadata.get('format')}, expected {ARTIFACT_FORMAT}")
+        return None
+    if feature_columns is not None and metadata.get('feature_columns') != list(feature_columns):
+        print(f"Ignoring artifact {path}: built for different features")
+        return None
+
+    def array(name):
+        return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+    try:
+        forest = metadata['forest']
+        flat_forest = FlatForest(*(array(f'forest_{attr}') for attr in _FOREST_ARRAYS),
+                                 forest['max_depth'], forest['n_features'])
+        history_years = array('history_years')
+        history_values = array('history_values')
+        forecast = ForecastTable(history_years, history_values, metadata['first_year'], array('forecast'))
+        bands = None
+        if metadata.get('band_percentiles'):
+            bands = ForecastBands(np.arange(metadata['first_year'], metadata['last_year'] + 1),
+                                  metadata['band_percentiles'], array('bands'))
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Ignoring unreadable artifact {path}: {e}")
+        return None
+    return Artifact(path, metadata, history_years, history_values, flat_forest, forecast, bands)
@@ -0,0 +1,151 @@
+"""
+Rolling-origin backtest of the recursive and direct forecasts.
+
+For every origin year the model is fitted only on data up to that year, rolled
+forward ``horizon`` years exactly like the served forecast (or, with
+``--strategy direct``, predicted in one call by the multi-horizon model in
+``direct.py``), and compared with what was actually observed. Errors are reported per horizon (1 year
+ahead, 2 years ahead, ...), which is what the web app's users experience.
+
+The feature matrix is computed once for the whole series. Every feature only
+looks backwards, so a fold trains on the rows up to its origin without
+recomputing anything. The direct model builds its own
+(origin, horizon) rows from the values up to the origin. Folds are independent and can run in a process pool;
+the matrix is handed to each worker once, not once per fold.
+
+Usage:
+    python backtest.py [--horizon 10] [--min-train 20] [--jobs 4] [--output folds.csv]
+                       [--strategy recursive|direct|both] [--engine forest|hgb|linear]
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from direct import fit_direct
+from engines import ENGINES, engine_params, fit_engine
+from features import feature_matrix
+from models import MODEL_PARAMS
+from rollout import model_predictor, rollout
+from sunspot_data import load_yearly
+
+RESULT_COLUMNS = ['origin', 'horizon', 'year', 'actual', 'predicted']
+STRATEGIES = ('recursive', 'direct')
+
+# Per-process copy of the shared series, set once by _init_worker
+_shared = {}
+
+
+def _init_worker(years, values, X, params, strategy='recursive'):
+    _shared.update(years=years, values=values, X=X, params=params, strategy=strategy)
+
+
+def evaluate_fold(years, values, X, params, origin, horizon, strategy='recursive'):
+    """Fit on years <= origin, forecast ``horizon`` years and return ``RESULT_COLUMNS`` rows as an array"""
+    n_history = int(np.searchsorted(years, origin, side='right'))
+    last_year = min(origin + horizon, int(years[-1]))
+    if strategy == 'direct':
+        model = fit_direct(years[:n_history], values[:n_history], params, max_horizon=horizon)
+        pred_years, predicted = model.forecast(values[:n_history], origin + 1, last_year)
+    else:
+        train = (years <= origin) & ~np.isnan(X).any(axis=1)
+        predictor = model_predictor(fit_engine(X[train], values[train], params))
+        pred_years, predicted = rollout(predictor, values[:n_history], origin + 1, last_year)
+    actual = values[n_history:n_history + len(pred_years)]
+    return np.column_stack([np.full(len(pred_years), origin), pred_years - origin,
+                            pred_years, actual, predicted])
+
+
+def _run_folds(origins, horizon):
+    return [evaluate_fold(_shared['years'], _shared['values'], _shared['X'], _shared['params'],
+                          origin, horizon, _shared['strategy'])
+            for origin in origins]
+
+
+def backtest_origins(years, min_train=20, step=1):
+    """Origin years for a rolling backtest: every ``step``-th year after ``min_train`` years"""
+    origins = [int(y) for y in np.asarray(years)[min_train - 1:-1:step]]
+    if not origins:
+        raise ValueError(f"Need more than {min_train} years of data to backtest")
+    return origins
+
+
+def run_backtest(years, values, horizon=10, min_train=20, step=1, params=None, n_jobs=1,
+                 strategy='recursive'):
+    """Backtest every ``step``-th origin after the first ``min_train`` years.
+
+    ``strategy`` is ``'recursive'`` (the served rollout) or ``'direct'``.
+
+    Returns one row per (origin, horizon) with the actual and predicted
+    values, as a DataFrame with ``RESULT_COLUMNS``.
+    """
+    years = np.asarray(years, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    X = feature_matrix(years, values)
+    params = dict(MODEL_PARAMS if params is None else params)
+    origins = backtest_origins(years, min_train, step)
+
+    if n_jobs > 1:
+        batches = [list(b) for b in np.array_split(origins, min(n_jobs, len(origins))) if len(b)]
+        with ProcessPoolExecutor(max_workers=len(batches), initializer=_init_worker,
+                                 initargs=(years, values, X, params, strategy)) as pool:
+            parts = [rows for batch in pool.map(_run_folds, batches, [horizon] * len(batches))
+                     for rows in batch]
+    else:
+        _init_worker(years, values, X, params, strategy)
+        parts = _run_folds(origins, horizon)
+
+    results = pd.DataFrame(np.vstack(parts), columns=RESULT_COLUMNS)
+    for column in ('origin', 'horizon', 'year'):
+        results[column] = results[column].astype(np.int64)
+    return results
+
+
+def summarize(results):
+    """MAE and RMSE per horizon"""
+    error = results['predicted'] - results['actual']
+    grouped = error.groupby(results['horizon'])
+    return pd.DataFrame({'folds': grouped.size(),
+                         'mae': grouped.apply(lambda e: e.abs().mean()),
+                         'rmse': grouped.apply(lambda e: np.sqrt((e ** 2).mean()))})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of the sunspot forecast')
+    parser.add_argument('--data', help='SILSO CSV file (default: $SUNSPOT_DATA or the built-in series)')
+    parser.add_argument('--horizon', type=int, default=10, help='years to forecast from each origin')
+    parser.add_argument('--min-train', type=int, default=20, help='years of data before the first origin')
+    parser.add_argument('--step', type=int, default=1, help='years between origins')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--strategy', choices=STRATEGIES + ('both',), default='recursive',
+                        help='forecast strategy to backtest; "both" compares them side by side')
+    parser.add_argument('--engine', choices=list(ENGINES), default='forest', help='model engine to backtest')
+    parser.add_argument('--output', help='write the per-fold rows to this CSV file')
+    args = parser.parse_args(argv)
+
+    years, values = load_yearly(args.data)
+    strategies = STRATEGIES if args.strategy == 'both' else (args.strategy,)
+    results, summaries, seconds = [], {}, {}
+    for strategy in strategies:
+        started = perf_counter()
+        result = run_backtest(years, values, horizon=args.horizon, min_train=args.min_train,
+                              step=args.step, params=engine_params(args.engine), n_jobs=args.jobs,
+                              strategy=strategy)
+        seconds[strategy] = perf_counter() - started
+        summaries[strategy] = summarize(result)
+        results.append(result.assign(strategy=strategy))
+    if args.output:
+        pd.concat(results, ignore_index=True).to_csv(args.output, index=False)
+    if len(strategies) == 1:
+        print(summaries[strategies[0]].to_string(float_format=lambda v: f'{v:.2f}'))
+        return
+    print(pd.concat(summaries, axis=1).to_string(float_format=lambda v: f'{v:.2f}'))
+    for strategy in strategies:
+        print(f"{strategy}: {seconds[strategy]:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare the model engines on cost and accuracy.
+
+For every engine in ``engines.py`` this fits on the full series and reports
+the fit time, the single-row and per-row batch prediction times, a full
+rollout to 2100 and the serialized size. With ``--backtest`` it also runs the
+rolling-origin backtest and adds the mean absolute error over its horizons.
+
+Usage:
+    python benchmarks/bench_engines.py [--repeat 200] [--backtest] [--horizon 10]
+"""
+import argparse
+import os
+import sys
+import warnings
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+warnings.filterwarnings('ignore')
+
+from backtest import run_backtest, summarize  # noqa: E402
+from engines import ENGINES, engine_params, fit_engine, measure_costs, median_seconds  # noqa: E402
+from features import feature_matrix  # noqa: E402
+from rollout import model_predictor, rollout  # noqa: E402
+from sunspot_data import load_yearly  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per case')
+    parser.add_argument('--backtest', action='store_true', help='also report backtest MAE per engine')
+    parser.add_argument('--horizon', type=int, default=10, help='backtest horizon in years')
+    args = parser.parse_args(argv)
+
+    years, values = load_yearly()
+    X = feature_matrix(years, values)
+    complete = ~np.isnan(X).any(axis=1)
+
+    header = f"{'engine':<8}{'fit':>12}{'predict 1':>13}{'batch/row':>13}{'rollout 2100':>15}{'size':>11}"
+    if args.backtest:
+        header += f"{'MAE':>8}"
+    print(header)
+    for name in ENGINES:
+        engine = fit_engine(X[complete], values[complete], engine_params(name))
+        costs = measure_costs(engine, X[complete], args.repeat)
+        predictor = model_predictor(engine)
+        rollout_time = median_seconds(lambda: rollout(predictor, values, int(years[-1]) + 1, 2100),
+                                      max(1, args.repeat // 20))
+        line = (f"{name:<8}{costs['fit_ms']:>9.2f} ms{costs['predict_one_us']:>10.1f} us"
+                f"{costs['predict_batch_us_per_row']:>10.2f} us{rollout_time * 1e3:>12.3f} ms"
+                f"{costs['size_bytes'] / 1024:>7.1f} KiB")
+        if args.backtest:
+            results = run_backtest(years, values, horizon=args.horizon, params=engine_params(name))
+            line += f"{summarize(results)['mae'].mean():>8.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
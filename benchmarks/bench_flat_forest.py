@@ -0,0 +1,66 @@
+"""
+Benchmark FlatForest against RandomForestRegressor.predict.
+
+Times single-row prediction and a full rollout to 2100 with both backends and
+checks that they agree.
+
+Usage:
+    python benchmarks/bench_flat_forest.py [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+warnings.filterwarnings('ignore')
+
+os.environ.setdefault('SUNSPOT_WARM_ON_IMPORT', '0')
+from app import create_features, load_data, predict_future_years, train_model  # noqa: E402
+from flat_forest import FlatForest  # noqa: E402
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return np.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per case')
+    args = parser.parse_args(argv)
+
+    df_features = create_features(load_data())
+    model = train_model(df_features)
+    flat = FlatForest.from_sklearn(model)
+    row = np.array([[0, 55, 5, 136.0, 121.0, 78.1, 48.8, 24.7, 111.7, 81.7, 55.9, 0.0, 1.0, 55]],
+                   dtype=np.float64)
+
+    assert flat.predict_one(row) == float(model.predict(row)[0])
+    sk_future = predict_future_years(model, df_features, 2025, 2100)
+    flat_future = predict_future_years(flat, df_features, 2025, 2100)
+    assert np.allclose(sk_future['Sunspot_Number'], flat_future['Sunspot_Number'])
+
+    rollout_repeat = max(1, args.repeat // 20)
+    cases = [
+        ('predict 1 row', time_call(lambda: model.predict(row), args.repeat),
+         time_call(lambda: flat.predict_one(row), args.repeat)),
+        ('rollout 2025-2100', time_call(lambda: predict_future_years(model, df_features, 2025, 2100), rollout_repeat),
+         time_call(lambda: predict_future_years(flat, df_features, 2025, 2100), rollout_repeat)),
+    ]
+
+    print(f"{'case':<20}{'sklearn':>14}{'FlatForest':>14}{'speedup':>10}")
+    for name, sk_time, flat_time in cases:
+        print(f"{name:<20}{sk_time * 1e3:>11.3f} ms{flat_time * 1e3:>11.3f} ms{sk_time / flat_time:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup benchmark: how long a fresh process takes to import the app and
+serve its first requests.
+
+Every repeat runs in a new interpreter, so nothing is cached in-process:
+
+    import       ``import app`` (with the import-time warm-up turned off)
+    warm         ``app.warm()``: fit or artifact load, plus the forecast
+    first json   the first /api/forecast request
+    first page   the first / request, which renders a chart
+
+It also reports which heavy libraries were loaded before the first page
+request, and the slowest direct imports of ``app`` from ``python -X importtime``.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--artifacts artifacts]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ('pandas', 'sklearn', 'matplotlib')
+
+CHILD = r'''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.warm()
+t2 = time.perf_counter()
+client = app.app.test_client()
+client.get('/api/forecast?start=2025&end=2039')
+t3 = time.perf_counter()
+loaded = [m for m in sys.argv[2:] if m in sys.modules]
+client.get('/')
+t4 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'warm': t2 - t1, 'first json': t3 - t2,
+                  'first page': t4 - t3, 'loaded': loaded}))
+'''
+
+
+def child_env(artifacts):
+    env = dict(os.environ, SUNSPOT_WARM_ON_IMPORT='0', MPLBACKEND='Agg')
+    env.pop('SUNSPOT_ARTIFACT_DIR', None)
+    if artifacts:
+        env['SUNSPOT_ARTIFACT_DIR'] = os.path.abspath(artifacts)
+    return env
+
+
+def run_once(env):
+    out = subprocess.run([sys.executable, '-c', CHILD, ROOT, *HEAVY_MODULES], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top=8):
+    """(cumulative ms, module) for the slowest modules imported directly by app"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((len(name) - len(name.lstrip()), int(cumulative) / 1e3, name.strip()))
+
+    app_index = max(i for i, row in enumerate(rows) if row[2] == 'app')
+    app_depth = rows[app_index][0]
+    children = []
+    # importtime lists a module after everything it imports, so app's direct
+    # imports are the rows just above it, one level deeper
+    for depth, ms, name in reversed(rows[:app_index]):
+        if depth <= app_depth:
+            break
+        if depth == app_depth + 2:
+            children.append((ms, name))
+    return sorted(children, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure app import time and first-request latency')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes to measure')
+    parser.add_argument('--artifacts', help='start from this artifact directory (see build_artifacts.py)')
+    args = parser.parse_args(argv)
+
+    env = child_env(args.artifacts)
+    runs = [run_once(env) for _ in range(args.repeat)]
+
+    print(f"{'phase':<14}{'median':>11}{'min':>11}")
+    for phase in ('import', 'warm', 'first json', 'first page'):
+        samples = np.array([run[phase] for run in runs]) * 1e3
+        print(f"{phase:<14}{np.median(samples):>9.1f}ms{samples.min():>9.1f}ms")
+    print(f"\nloaded before the first page: {', '.join(runs[-1]['loaded']) or 'none'}")
+
+    print('\nslowest imports of app:')
+    for ms, name in slowest_imports(env):
+        print(f"  {name:<24}{ms:>9.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
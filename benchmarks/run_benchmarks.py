@@ -0,0 +1,188 @@
+"""
+Benchmark suite for every hot path of the web app.
+
+Each case is timed for a number of repeats after a warm-up call, and then run
+once more under ``tracemalloc`` to record its peak Python memory use. Timings
+are not measured while tracing, so tracing does not inflate them. Results are
+printed as a table and can be saved as JSON and compared against an earlier
+run:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    ... change something ...
+    python benchmarks/run_benchmarks.py --compare before.json
+
+``--compare`` exits with status 1 when any case's median got slower than
+``--threshold`` (default 10%), so it can gate CI.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings('ignore')
+
+os.environ.setdefault('SUNSPOT_WARM_ON_IMPORT', '0')
+import app as sunspot_app  # noqa: E402
+from charts import render_chart  # noqa: E402
+
+
+def build_cases():
+    """Name -> (callable, repeats) for every benchmarked path"""
+    df = sunspot_app.load_data()
+    df_features = sunspot_app.create_features(df)
+    model = sunspot_app.train_model(df_features)
+    entry = sunspot_app.get_model_entry()
+    flat = sunspot_app.get_predictor(entry)
+    future = sunspot_app.predict_future_years(flat, df_features, 2025, 2039)
+    direct = sunspot_app.get_direct_model(entry)
+    combined = pd.concat([df[['Year', 'Sunspot_Number']], future], ignore_index=True)
+    client = sunspot_app.app.test_client()
+    page_etag = client.get('/?year=2100').headers['ETag']
+
+    def index_get_cold():
+        sunspot_app.plot_cache.clear()
+        sunspot_app.page_cache.clear()
+        client.get('/')
+
+    # Four different charts requested at once, as threaded workers would
+    render_jobs = [(df[['Year', 'Sunspot_Number']], future[future['Year'] <= year], year)
+                   for year in (2030, 2033, 2036, 2039)]
+    request_threads = ThreadPoolExecutor(max_workers=len(render_jobs))
+
+    def render_concurrent():
+        list(request_threads.map(lambda job: sunspot_app.render_pool.render(*job), render_jobs))
+
+    return {
+        'load_data': (sunspot_app.load_data, 200),
+        'create_features': (lambda: sunspot_app.create_features(df), 200),
+        'train_model': (lambda: sunspot_app.train_model(df_features), 5),
+        'predict_single_year 2039 (sklearn)': (lambda: sunspot_app.predict_single_year(model, df_features, 2039), 10),
+        'predict_single_year 2039 (flat)': (lambda: sunspot_app.predict_single_year(flat, df_features, 2039), 50),
+        'predict_future_years 2025-2039 (sklearn)': (
+            lambda: sunspot_app.predict_future_years(model, df_features, 2025, 2039), 10),
+        'predict_future_years 2025-2039 (flat)': (
+            lambda: sunspot_app.predict_future_years(flat, df_features, 2025, 2039), 50),
+        'predict_future_years 2025-2100 (sklearn)': (
+            lambda: sunspot_app.predict_future_years(model, df_features, 2025, 2100), 5),
+        'predict_future_years 2025-2100 (flat)': (
+            lambda: sunspot_app.predict_future_years(flat, df_features, 2025, 2100), 20),
+        'direct forecast 2025-2039': (
+            lambda: sunspot_app.predict_direct_years(direct, df_features, 2025, 2039), 50),
+        'direct forecast 2025-2100': (
+            lambda: sunspot_app.predict_direct_years(direct, df_features, 2025, 2100), 50),
+        'find_solar_max_min': (lambda: sunspot_app.find_solar_max_min(combined, 2039), 200),
+        'render_plot_png': (lambda: sunspot_app.render_plot_png(df[['Year', 'Sunspot_Number']], future, 2039), 5),
+        'render png-lite': (lambda: render_chart('png-lite', df[['Year', 'Sunspot_Number']], future, 2039), 5),
+        'render webp': (lambda: render_chart('webp', df[['Year', 'Sunspot_Number']], future, 2039), 5),
+        'render svg': (lambda: render_chart('svg', df[['Year', 'Sunspot_Number']], future, 2039), 50),
+        'render x4 concurrent (pool)': (render_concurrent, 3),
+        'index GET (cold plot)': (index_get_cold, 5),
+        'index GET (cached)': (lambda: client.get('/'), 50),
+        'index POST 2100 (cached)': (lambda: client.post('/', data={'year': '2100'}), 50),
+        'index GET ?year=2100 (gzip, cached)': (
+            lambda: client.get('/?year=2100', headers={'Accept-Encoding': 'gzip'}), 50),
+        'index GET ?year=2100 (304)': (
+            lambda: client.get('/?year=2100', headers={'If-None-Match': page_etag}), 200),
+        'api forecast range': (lambda: client.get('/api/forecast?start=2025&end=2100'), 100),
+    }
+
+
+def measure(fn, repeats):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1e3
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'repeats': repeats,
+            'median_ms': float(np.median(samples)),
+            'p90_ms': float(np.percentile(samples, 90)),
+            'p99_ms': float(np.percentile(samples, 99)),
+            'min_ms': float(samples.min()),
+            'mean_ms': float(samples.mean()),
+            'peak_kib': peak / 1024}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import matplotlib
+    import sklearn
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'pandas': pd.__version__,
+            'sklearn': sklearn.__version__, 'matplotlib': matplotlib.__version__}
+
+
+def compare(results, baseline, threshold):
+    """Print median ratios against ``baseline``; returns True if anything regressed"""
+    regressed = False
+    print(f"\n{'case':<44}{'before':>11}{'after':>11}{'ratio':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<44}{'-':>11}{result['median_ms']:>9.3f}ms{'new':>8}")
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"{name:<44}{before['median_ms']:>9.3f}ms{result['median_ms']:>9.3f}ms{ratio:>7.2f}x{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the sunspot app hot paths')
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown of the median that counts as a regression')
+    parser.add_argument('--filter', help='only run cases whose name contains this text')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every repeat count')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'case':<44}{'median':>11}{'p90':>11}{'p99':>11}{'peak':>12}")
+    for name, (fn, repeats) in build_cases().items():
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(fn, max(1, int(repeats * args.scale)))
+        results[name] = result
+        print(f"{name:<44}{result['median_ms']:>9.3f}ms{result['p90_ms']:>9.3f}ms"
+              f"{result['p99_ms']:>9.3f}ms{result['peak_kib']:>8.0f} KiB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump({'environment': environment(), 'results': results}, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as fh:
+            baseline = json.load(fh)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
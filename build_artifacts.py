@@ -0,0 +1,48 @@
+"""
+Build step: fit the model once and write it out as a prebuilt artifact.
+
+The artifact holds the fitted forest, its array export, the precomputed
+forecast (and prediction bands) up to ``app.MAX_YEAR`` and the metadata
+needed to check it still matches the code. Point ``SUNSPOT_ARTIFACT_DIR`` at
+the output directory and the app serves from it instead of fitting at
+startup. See ``artifacts.py`` for the layout.
+
+Usage:
+    python build_artifacts.py [--output artifacts] [--no-bands]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('SUNSPOT_WARM_ON_IMPORT', '0')
+os.environ.pop('SUNSPOT_ARTIFACT_DIR', None)  # always build from scratch
+
+import app as sunspot_app  # noqa: E402
+from artifacts import save_artifact  # noqa: E402
+from features import FEATURE_COLUMNS  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit the sunspot model and write a prebuilt artifact')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts'),
+                        help='artifact root directory (default: ./artifacts)')
+    parser.add_argument('--no-bands', action='store_true', help='skip the per-tree prediction bands')
+    args = parser.parse_args(argv)
+
+    if sunspot_app.ENGINE != 'forest':
+        parser.error(f"artifacts hold the forest; unset SUNSPOT_ENGINE (currently {sunspot_app.ENGINE!r})")
+
+    start = time.perf_counter()
+    entry = sunspot_app.get_model_entry()
+    flat_forest = sunspot_app.get_predictor(entry)
+    forecast = sunspot_app.get_forecast(entry)
+    bands = None if args.no_bands else sunspot_app.get_bands(entry)
+    os.makedirs(args.output, exist_ok=True)
+    path = save_artifact(args.output, entry, flat_forest, forecast, bands,
+                         feature_columns=FEATURE_COLUMNS, max_year=sunspot_app.MAX_YEAR)
+    print(f"Wrote {path} (model {entry.key}, forecast {forecast.first_year}-{forecast.last_year}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
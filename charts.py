@@ -0,0 +1,408 @@
+"""
+Chart rendering for the web app.
+
+A chart can be produced in several output modes (``CHART_MODES``): the
+full-resolution PNG, a reduced-resolution PNG, a WebP, an SVG built directly
+from the arrays, or just the series as JSON for the browser to draw itself.
+
+matplotlib is imported inside ``render_plot_bytes`` rather than at module
+level, so importing this module (and ``app``) stays cheap and requests that
+never draw a raster chart never load it.
+"""
+import base64
+import functools
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from extrema import find_extrema
+from uncertainty import BAND_PERCENTILES
+
+# Mode -> MIME type of the rendered bytes
+CHART_MODES = {
+    'png': 'image/png',          # 14x7in at 160 dpi, the original chart
+    'png-lite': 'image/png',     # same chart at LITE_DPI
+    'webp': 'image/webp',        # lossy WebP at WEBP_DPI (PNG if Pillow lacks WebP)
+    'svg': 'image/svg+xml',      # vector chart built from the arrays, no matplotlib
+    'client': 'application/json',  # series only; the page draws the chart
+}
+FULL_DPI = 160
+LITE_DPI = 72
+WEBP_DPI = 100
+WEBP_QUALITY = 80
+
+CYCLE_START = 1970
+CYCLE_YEARS = 11
+
+
+def find_solar_max_min(combined_df, end_year, window=3, max_threshold=40, min_threshold=25):
+    """Find solar maximum and minimum years in the data.
+
+    A year counts as a maximum (minimum) when it is strictly above (below)
+    every year within ``window`` years on each side and above ``max_threshold``
+    (below ``min_threshold``). Returns the top 6 maxima and bottom 6 minima to
+    avoid clutter.
+    """
+    filtered_df = combined_df[combined_df['Year'] <= end_year]
+    return find_extrema(filtered_df['Year'].to_numpy(), filtered_df['Sunspot_Number'].to_numpy(),
+                        window=window, max_threshold=max_threshold,
+                        min_threshold=min_threshold, limit=6)
+
+
+def render_plot_png(historical_df, predicted_df, end_year, band=None):
+    """Render plot from 1970 to end_year as a base64-encoded PNG"""
+    return base64.b64encode(render_plot_bytes(historical_df, predicted_df, end_year, band)).decode('ascii')
+
+
+def render_plot_bytes(historical_df, predicted_df, end_year, band=None, fmt='png', dpi=FULL_DPI):
+    """Render plot from 1970 to end_year with 11-year cycle markers.
+
+    ``band`` is an optional ``(years, lower, upper)`` prediction interval
+    drawn as a shaded area behind the predicted line. ``fmt`` is any format
+    matplotlib can save (``'png'``, ``'webp'``, ...).
+    """
+    # Imported here so cold starts and JSON requests never load matplotlib.
+    # Figure + FigureCanvasAgg touch no pyplot or rcParams state, so renders
+    # can run concurrently in threads.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(14, 7), facecolor='#0a0e27', edgecolor='black')
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.set_facecolor('#0a0e27')
+
+    # Filter data up to end_year
+    hist_filtered = historical_df[historical_df['Year'] <= end_year].copy()
+    pred_filtered = predicted_df[predicted_df['Year'] <= end_year].copy()
+    
+    # Combine for finding max/min
+    combined_df = pd.concat([hist_filtered, pred_filtered], ignore_index=True).sort_values('Year')
+
+    # Plot historical data
+    if not hist_filtered.empty:
+        ax.plot(hist_filtered['Year'], hist_filtered['Sunspot_Number'], 
+                'o-', color='#4A90E2', linewidth=2.5, markersize=6, 
+                label='Historical Data', alpha=0.9, markerfacecolor='#6BB6FF')
+    
+    # Shade the prediction interval
+    if band is not None and len(band[0]):
+        band_years, lower, upper = band
+        ax.fill_between(band_years, lower, upper, color='#FF6B9D', alpha=0.18, linewidth=0,
+                        label=f'Predicted {BAND_PERCENTILES[0]}–{BAND_PERCENTILES[-1]}th percentile')
+
+    # Plot predicted data
+    if not pred_filtered.empty:
+        ax.plot(pred_filtered['Year'], pred_filtered['Sunspot_Number'], 
+                's--', color='#FF6B9D', linewidth=2.5, markersize=5, 
+                label='Predicted Data', alpha=0.9, markerfacecolor='#FF8FB3')
+
+    # Find and mark solar maxima and minima
+    maxima, minima = find_solar_max_min(combined_df, end_year)
+    
+    # Mark solar maxima
+    for year, value in maxima:
+        ax.scatter(year, value, s=400, color='#FFD700', marker='*', 
+                  edgecolors='#FFA500', linewidths=2.5, zorder=5, alpha=0.95)
+        # Get y limits after plotting for proper positioning
+        y_min, y_max = ax.get_ylim()
+        y_range = y_max - y_min
+        ax.annotate('Solar Maximum', xy=(year, value), 
+                   xytext=(year, value + y_range * 0.12),
+                   fontsize=11, fontweight='bold', color='#FFD700',
+                   ha='center', va='bottom',
+                   bbox=dict(boxstyle='round,pad=0.6', facecolor='#0a0e27', 
+                           edgecolor='#FFD700', linewidth=2, alpha=0.9),
+                   arrowprops=dict(arrowstyle='->', color='#FFD700', lw=2))
+    
+    # Mark solar minima
+    for year, value in minima:
+        ax.scatter(year, value, s=400, color='#00CED1', marker='v', 
+                  edgecolors='#20B2AA', linewidths=2.5, zorder=5, alpha=0.95)
+        # Get y limits after plotting for proper positioning
+        y_min, y_max = ax.get_ylim()
+        y_range = y_max - y_min
+        ax.annotate('Solar Minimum', xy=(year, value), 
+                   xytext=(year, value - y_range * 0.12),
+                   fontsize=11, fontweight='bold', color='#00CED1',
+                   ha='center', va='top',
+                   bbox=dict(boxstyle='round,pad=0.6', facecolor='#0a0e27', 
+                           edgecolor='#00CED1', linewidth=2, alpha=0.9),
+                   arrowprops=dict(arrowstyle='->', color='#00CED1', lw=2))
+
+    # Add 11-year cycle markers (vertical lines every 11 years starting from 1970)
+    cycle_start_year = 1970
+    i = 0
+    while True:
+        cycle_year = cycle_start_year + i * 11
+        if cycle_year > end_year:
+            break
+        ax.axvline(x=cycle_year, color='#4A5568', linestyle=':', alpha=0.5, linewidth=1.5)
+        i += 1
+
+    # Set x-axis ticks to show 11-year intervals
+    x_ticks = []
+    tick_year = 1970
+    while tick_year <= end_year:
+        x_ticks.append(tick_year)
+        tick_year += 11
+    
+    # Add end_year if not already in ticks
+    if end_year not in x_ticks:
+        x_ticks.append(end_year)
+    
+    ax.set_xticks(sorted(x_ticks))
+    ax.set_xlim(1970, end_year)
+
+    # Style axes for dark theme
+    ax.tick_params(colors='#E2E8F0')
+    ax.spines['bottom'].set_color('#4A5568')
+    ax.spines['top'].set_color('#4A5568')
+    ax.spines['right'].set_color('#4A5568')
+    ax.spines['left'].set_color('#4A5568')
+
+    ax.set_xlabel('Year (11-Year Solar Cycle Scale)', fontsize=12, fontweight='bold', color='#E2E8F0')
+    ax.set_ylabel('Sunspot Number', fontsize=12, fontweight='bold', color='#E2E8F0')
+    ax.set_title(f'Sunspot Number Prediction (1970–{end_year}) — 11-Year Solar Cycle', 
+                fontsize=14, fontweight='bold', pad=15, color='#E2E8F0')
+    ax.grid(True, linestyle='--', alpha=0.2, color='#4A5568')
+    ax.legend(loc='upper left', fontsize=10, framealpha=0.9, 
+             facecolor='#1a1f3a', edgecolor='#4A5568', labelcolor='#E2E8F0')
+
+    buf = io.BytesIO()
+    fig.tight_layout()
+    options = {'pil_kwargs': {'quality': WEBP_QUALITY}} if fmt == 'webp' else {}
+    fig.savefig(buf, format=fmt, dpi=dpi, facecolor='#0a0e27', edgecolor='black', **options)
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def webp_supported():
+    """Whether Pillow (installed with matplotlib) can encode WebP"""
+    try:
+        from PIL import features
+        return bool(features.check('webp'))
+    except ImportError:
+        return False
+
+
+def chart_mimetype(mode):
+    if mode == 'webp' and not webp_supported():
+        return 'image/png'
+    return CHART_MODES[mode]
+
+
+def _visible(historical_df, predicted_df, end_year, band):
+    """Arrays actually drawn for ``end_year``: history, forecast, band, extrema"""
+    hist = historical_df[historical_df['Year'] <= end_year]
+    pred = predicted_df[predicted_df['Year'] <= end_year]
+    combined = pd.concat([hist, pred], ignore_index=True).sort_values('Year')
+    maxima, minima = find_solar_max_min(combined, end_year)
+    if band is not None and len(band[0]):
+        band_years, lower, upper = band
+        keep = band_years <= end_year
+        band = (band_years[keep], lower[keep], upper[keep])
+    else:
+        band = None
+    return ((hist['Year'].to_numpy(), hist['Sunspot_Number'].to_numpy(dtype=float)),
+            (pred['Year'].to_numpy(), pred['Sunspot_Number'].to_numpy(dtype=float)),
+            band, maxima, minima)
+
+
+def chart_series(historical_df, predicted_df, end_year, band=None):
+    """The chart's data as a JSON-ready dict, for drawing it in the browser"""
+    (hist_years, hist_values), (pred_years, pred_values), band, maxima, minima = \
+        _visible(historical_df, predicted_df, end_year, band)
+
+    def pairs(years, values):
+        return [[int(y), round(float(v), 2)] for y, v in zip(years, values)]
+
+    return {'start_year': CYCLE_START, 'end_year': int(end_year), 'cycle_years': CYCLE_YEARS,
+            'historical': pairs(hist_years, hist_values),
+            'predicted': pairs(pred_years, pred_values),
+            'band': None if band is None else [[int(y), round(float(lo), 2), round(float(hi), 2)]
+                                               for y, lo, hi in zip(*band)],
+            'band_label': f'Predicted {BAND_PERCENTILES[0]}–{BAND_PERCENTILES[-1]}th percentile',
+            'maxima': pairs(*zip(*maxima)) if maxima else [],
+            'minima': pairs(*zip(*minima)) if minima else []}
+
+
+def _nice_step(span, target=6):
+    for step in (5, 10, 20, 25, 50, 100, 200, 250, 500):
+        if span / step <= target:
+            return step
+    return 1000
+
+
+def render_svg(historical_df, predicted_df, end_year, band=None, width=1400, height=700):
+    """The chart as a standalone SVG document, built directly from the arrays.
+
+    Same layout and colours as the PNG but drawn without matplotlib; typically
+    a few tens of KB and sharp at any size.
+    """
+    (hist_years, hist_values), (pred_years, pred_values), band, maxima, minima = \
+        _visible(historical_df, predicted_df, end_year, band)
+
+    left, right, top, bottom = 70, 20, 50, 60
+    plot_w, plot_h = width - left - right, height - top - bottom
+    peaks = [v.max() for v in (hist_values, pred_values) if len(v)]
+    if band is not None:
+        peaks.append(band[2].max())
+    y_max = max(peaks + [1.0]) * 1.25  # headroom for the maximum labels
+    x_span = max(end_year - CYCLE_START, 1)
+
+    def x(year):
+        return f'{left + (year - CYCLE_START) / x_span * plot_w:.1f}'
+
+    def y(value):
+        return f'{top + plot_h - value / y_max * plot_h:.1f}'
+
+    def points(years, values):
+        return ' '.join(f'{x(yr)},{y(v)}' for yr, v in zip(years, values))
+
+    text = 'fill="#E2E8F0" font-family="sans-serif"'
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+           f'width="100%" role="img" aria-label="Sunspot chart">',
+           f'<rect width="{width}" height="{height}" fill="#0a0e27"/>']
+
+    step = _nice_step(y_max)
+    for value in range(0, int(y_max) + 1, step):
+        out.append(f'<line x1="{left}" x2="{width - right}" y1="{y(value)}" y2="{y(value)}" '
+                   f'stroke="#4A5568" stroke-opacity="0.2" stroke-dasharray="4 4"/>')
+        out.append(f'<text x="{left - 8}" y="{y(value)}" {text} font-size="12" text-anchor="end" '
+                   f'dominant-baseline="middle">{value}</text>')
+    ticks = list(range(CYCLE_START, end_year + 1, CYCLE_YEARS))
+    for year in ticks:
+        out.append(f'<line x1="{x(year)}" x2="{x(year)}" y1="{top}" y2="{top + plot_h}" '
+                   f'stroke="#4A5568" stroke-opacity="0.5" stroke-width="1.5" stroke-dasharray="2 4"/>')
+    if end_year not in ticks:
+        ticks.append(end_year)
+    for year in ticks:
+        out.append(f'<text x="{x(year)}" y="{top + plot_h + 20}" {text} font-size="12" '
+                   f'text-anchor="middle">{year}</text>')
+    out.append(f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#4A5568"/>')
+
+    if band is not None:
+        band_years, lower, upper = band
+        outline = points(band_years, upper) + ' ' + points(band_years[::-1], lower[::-1])
+        out.append(f'<polygon points="{outline}" fill="#FF6B9D" fill-opacity="0.18"/>')
+    if len(hist_years):
+        out.append(f'<polyline points="{points(hist_years, hist_values)}" fill="none" '
+                   f'stroke="#4A90E2" stroke-width="2.5"/>')
+        out.extend(f'<circle cx="{x(yr)}" cy="{y(v)}" r="3.5" fill="#6BB6FF"/>'
+                   for yr, v in zip(hist_years, hist_values))
+    if len(pred_years):
+        out.append(f'<polyline points="{points(pred_years, pred_values)}" fill="none" '
+                   f'stroke="#FF6B9D" stroke-width="2.5" stroke-dasharray="8 5"/>')
+        out.extend(f'<rect x="{float(x(yr)) - 3:.1f}" y="{float(y(v)) - 3:.1f}" width="6" height="6" '
+                   f'fill="#FF8FB3"/>' for yr, v in zip(pred_years, pred_values))
+
+    for markers, symbol, color, label, offset in ((maxima, '★', '#FFD700', 'Solar Maximum', -28),
+                                                  (minima, '▼', '#00CED1', 'Solar Minimum', 30)):
+        for year, value in markers:
+            out.append(f'<text x="{x(year)}" y="{y(value)}" fill="{color}" font-size="22" '
+                       f'text-anchor="middle" dominant-baseline="central">{symbol}</text>')
+            out.append(f'<text x="{x(year)}" y="{float(y(value)) + offset:.1f}" fill="{color}" '
+                       f'font-family="sans-serif" font-size="12" font-weight="bold" '
+                       f'text-anchor="middle">{label}</text>')
+
+    out.append(f'<text x="{width / 2}" y="{top - 18}" {text} font-size="16" font-weight="bold" '
+               f'text-anchor="middle">Sunspot Number Prediction ({CYCLE_START}–{end_year}) — '
+               f'11-Year Solar Cycle</text>')
+    out.append(f'<text x="{left + plot_w / 2}" y="{height - 12}" {text} font-size="13" font-weight="bold" '
+               f'text-anchor="middle">Year (11-Year Solar Cycle Scale)</text>')
+    out.append(f'<text transform="translate(18 {top + plot_h / 2}) rotate(-90)" {text} font-size="13" '
+               f'font-weight="bold" text-anchor="middle">Sunspot Number</text>')
+
+    legend = [('#4A90E2', 'Historical Data', '')]
+    if band is not None:
+        legend.append(('#FF6B9D', f'Predicted {BAND_PERCENTILES[0]}–{BAND_PERCENTILES[-1]}th percentile', 'band'))
+    legend.append(('#FF6B9D', 'Predicted Data', '8 5'))
+    out.append(f'<rect x="{left + 10}" y="{top + 10}" width="260" height="{12 + 22 * len(legend)}" '
+               f'fill="#1a1f3a" fill-opacity="0.9" stroke="#4A5568"/>')
+    for i, (color, label, dash) in enumerate(legend):
+        row_y = top + 28 + 22 * i
+        if dash == 'band':
+            out.append(f'<rect x="{left + 20}" y="{row_y - 6}" width="30" height="12" fill="{color}" '
+                       f'fill-opacity="0.18"/>')
+        else:
+            dash_attr = f' stroke-dasharray="{dash}"' if dash else ''
+            out.append(f'<line x1="{left + 20}" x2="{left + 50}" y1="{row_y}" y2="{row_y}" '
+                       f'stroke="{color}" stroke-width="2.5"{dash_attr}/>')
+        out.append(f'<text x="{left + 60}" y="{row_y}" {text} font-size="12" '
+                   f'dominant-baseline="middle">{label}</text>')
+
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+def render_chart(mode, historical_df, predicted_df, end_year, band=None):
+    """The chart in output ``mode`` (a key of ``CHART_MODES``) as bytes"""
+    if mode == 'png':
+        return render_plot_bytes(historical_df, predicted_df, end_year, band)
+    if mode == 'png-lite' or (mode == 'webp' and not webp_supported()):
+        return render_plot_bytes(historical_df, predicted_df, end_year, band, dpi=LITE_DPI)
+    if mode == 'webp':
+        return render_plot_bytes(historical_df, predicted_df, end_year, band, fmt='webp', dpi=WEBP_DPI)
+    if mode == 'svg':
+        return render_svg(historical_df, predicted_df, end_year, band).encode('utf-8')
+    if mode == 'client':
+        return json.dumps(chart_series(historical_df, predicted_df, end_year, band),
+                          separators=(',', ':')).encode('utf-8')
+    raise ValueError(f"Unknown chart mode {mode!r}; expected one of {', '.join(CHART_MODES)}")
+
+
+class RenderPool:
+    """Bounded pool that renders charts while the request thread waits.
+
+    ``kind='thread'`` renders in threads of this process; ``kind='process'``
+    renders in worker processes, so renders also run in parallel with each
+    other and with request handling despite the GIL. At most ``workers``
+    renders run at once; ``workers=0`` renders inline on the calling thread.
+    The executor is created on first use, so a pool made before gunicorn forks
+    gets fresh workers in every worker process.
+    """
+
+    def __init__(self, workers=2, kind='thread', timeout=None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Render pool kind must be 'thread' or 'process', got {kind!r}")
+        self.workers = workers
+        self.kind = kind
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                executor_cls = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+                self._executor = executor_cls(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def render(self, historical_df, predicted_df, end_year, band=None, mode='png'):
+        """``render_chart`` on the pool; waits at most ``timeout`` seconds"""
+        if self.workers <= 0:
+            return render_chart(mode, historical_df, predicted_df, end_year, band)
+        executor = self._get_executor()
+        try:
+            future = executor.submit(render_chart, mode, historical_df, predicted_df, end_year, band)
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next render
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
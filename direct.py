@@ -0,0 +1,129 @@
+"""
+Direct multi-horizon forecasting.
+
+The recursive rollout predicts one year at a time and feeds each prediction
+back as the next year's lags, so a forecast ``H`` years out takes ``H``
+sequential model calls. The direct strategy trains a single model (any
+engine from ``engines.py``, the forest by default) with the horizon as a
+feature instead. A row describes what is known at the end of
+an origin year: the last five values and the 3/5/11-year moving averages up
+to and including that year. It also holds the horizon ``h`` and the target
+year's position in the 11-year cycle. The target is the value ``h`` years
+after the origin.
+
+Training rows come from every origin in the series and every horizon up to
+``max_horizon`` whose target has been observed. A forecast builds one row per
+future year, all from the same origin, and predicts them in one vectorised
+call, so its cost hardly grows with the horizon. Horizons beyond
+``max_horizon`` fall into the same leaves as the longest trained horizon,
+while the target-year cycle features still vary.
+"""
+import numpy as np
+
+from features import CYCLE_LENGTH, CYCLE_ORIGIN, LAGS, MA_WINDOWS, feature_matrix
+from engines import fit_engine
+
+DIRECT_FEATURES = ['Horizon', 'Target_Cycle_Position', 'Target_Years_Since_1970',
+                   'Target_Sin_Cycle', 'Target_Cos_Cycle',
+                   'Lag_1', 'Lag_2', 'Lag_3', 'Lag_4', 'Lag_5', 'MA_3', 'MA_5', 'MA_11']
+# Longest horizon trained on by default; the series must be long enough to observe it
+DIRECT_MAX_HORIZON = 30
+
+
+def origin_context(years, values):
+    """Lags and moving averages known at the end of each year, as an ``(n, 8)`` array.
+
+    Row ``i`` holds ``values[i], values[i-1], ... values[i-4]`` followed by the
+    moving averages of the values up to and including ``values[i]``. Lags
+    before the start of the series are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    context = np.empty((n, len(LAGS) + 3), dtype=np.float64)
+    for i in range(len(LAGS)):
+        context[:i, i] = np.nan
+        context[i:, i] = values[:n - i]
+    # feature_matrix's moving averages include the row's own value
+    context[:, len(LAGS):] = feature_matrix(years, values)[:, 8:11]
+    return context
+
+
+def direct_rows(target_years, horizons, context):
+    """Feature rows for predicting ``target_years`` at ``horizons`` from ``context`` rows"""
+    target_years = np.asarray(target_years, dtype=np.int64)
+    offset = target_years - CYCLE_ORIGIN
+    cycle_pos = offset % CYCLE_LENGTH
+    angle = 2 * np.pi * cycle_pos / CYCLE_LENGTH
+    X = np.empty((len(target_years), len(DIRECT_FEATURES)), dtype=np.float64)
+    X[:, 0] = horizons
+    X[:, 1] = cycle_pos
+    X[:, 2] = offset
+    X[:, 3] = np.sin(angle)
+    X[:, 4] = np.cos(angle)
+    X[:, 5:] = context
+    return X
+
+
+def training_set(years, values, max_horizon=DIRECT_MAX_HORIZON):
+    """``(X, y)`` for every (origin, horizon) pair whose target is observed"""
+    years = np.asarray(years, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    context = origin_context(years, values)
+    origins = np.flatnonzero(~np.isnan(context).any(axis=1))
+    origin, horizon = np.meshgrid(origins, np.arange(1, max_horizon + 1), indexing='ij')
+    origin, horizon = origin.ravel(), horizon.ravel()
+    keep = origin + horizon < len(values)
+    origin, horizon = origin[keep], horizon[keep]
+    X = direct_rows(years[origin] + horizon, horizon, context[origin])
+    return X, values[origin + horizon]
+
+
+class DirectForecaster:
+    """An engine trained on direct rows, forecasting a whole range in one call"""
+
+    def __init__(self, engine, max_horizon):
+        self.engine = engine
+        self.max_horizon = int(max_horizon)
+
+    def _rows(self, history, start_year, end_year):
+        history = np.asarray(history, dtype=np.float64)
+        if history.size < len(LAGS):
+            raise ValueError(f"A direct forecast needs at least {len(LAGS)} observed values")
+        tail = history[-max(MA_WINDOWS):]
+        context = origin_context(np.arange(len(tail)), tail)[-1]
+        target_years = np.arange(start_year, end_year + 1)
+        horizons = target_years - (start_year - 1)
+        return target_years, direct_rows(target_years, horizons, context[None, :])
+
+    def forecast(self, history, start_year, end_year):
+        """Forecast ``start_year..end_year`` from ``history`` ending the year before
+        ``start_year``; returns ``(years, values)`` clipped at zero"""
+        years, X = self._rows(history, start_year, end_year)
+        if len(years) == 0:
+            return years, np.empty(0, dtype=np.float64)
+        return years, np.maximum(self.engine.predict_batch(X), 0.0)
+
+    def tree_forecasts(self, history, start_year, end_year):
+        """Each tree's forecast, shaped ``(n_trees, n_years)`` and clipped at zero.
+
+        Only the forest engine has trees; others raise ``ValueError``.
+        """
+        forest = getattr(self.engine, 'forest', None)
+        if forest is None:
+            raise ValueError(f"The {self.engine.name} engine has no per-tree forecasts")
+        years, X = self._rows(history, start_year, end_year)
+        if len(years) == 0:
+            return years, np.empty((forest.n_trees, 0), dtype=np.float64)
+        return years, np.maximum(forest.predict_trees(X), 0.0)
+
+
+def fit_direct(years, values, params=None, max_horizon=DIRECT_MAX_HORIZON):
+    """Fit the direct model on a yearly series; ``max_horizon`` is capped by its length.
+
+    ``params`` are model parameters as for ``engines.fit_engine``.
+    """
+    max_horizon = max(1, min(max_horizon, len(values) - len(LAGS)))
+    X, y = training_set(years, values, max_horizon)
+    if len(y) == 0:
+        raise ValueError(f"Need more than {len(LAGS)} years of data for a direct forecast")
+    return DirectForecaster(fit_engine(X, y, params), max_horizon)
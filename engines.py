@@ -0,0 +1,216 @@
+"""
+Interchangeable model engines.
+
+Every engine has the same small interface, so the rollout, the direct
+forecast, the web app and the command-line tools do not care which one they
+are given:
+
+- ``fit(X, y)`` trains on rows of ``FEATURE_COLUMNS`` and returns the engine;
+- ``predict_one(row)`` returns a single prediction as a float (what the
+  rollout calls once per forecast year);
+- ``predict_batch(X)`` returns an array with one prediction per row;
+- ``serialize()`` returns bytes that ``deserialize`` turns back into an engine;
+- ``update(X, y)`` returns a new engine refitted on a dataset that grew. (The
+  web app grows its forest by warm start instead; see ``app.extend_model``.)
+
+Backends:
+
+- ``forest``: the project's random forest, served through its ``FlatForest``
+  export. This is the default.
+- ``hgb``: scikit-learn's ``HistGradientBoostingRegressor``.
+- ``linear``: least squares (optionally ridge) on the same 14 features, in
+  pure NumPy. The features already hold the lags and the sin/cos of the
+  cycle, so this is an autoregressive model with harmonic terms. It fits in
+  microseconds and predicts with one dot product.
+
+Every engine records its fit time in ``fit_seconds``. ``measure_costs`` adds
+inference timings and the serialized size.
+"""
+import pickle
+import time
+
+import numpy as np
+
+from flat_forest import FlatForest
+from models import MODEL_PARAMS, fit_forest
+
+DEFAULT_ENGINE = 'forest'
+
+
+class Engine:
+    """Base class: subclasses set ``name``, ``label`` (for display) and
+    ``default_params`` and implement ``_fit``, ``predict_one`` and ``predict_batch``"""
+
+    name = None
+    label = None
+    default_params = {}
+
+    def __init__(self, params=None):
+        self.params = dict(self.default_params if params is None else params)
+        self.fit_seconds = None
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        start = time.perf_counter()
+        self._fit(X, y)
+        self.fit_seconds = time.perf_counter() - start
+        return self
+
+    def predict(self, X):
+        """Alias of ``predict_batch``, so code written for scikit-learn models works unchanged"""
+        return self.predict_batch(X)
+
+    def score(self, X, y):
+        """R² of the predictions for ``X`` against ``y``, like scikit-learn's ``score``"""
+        y = np.asarray(y, dtype=np.float64)
+        residual = ((y - self.predict_batch(X)) ** 2).sum()
+        total = ((y - y.mean()) ** 2).sum()
+        return 1.0 - residual / total if total else 0.0
+
+    def serialize(self):
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def update(self, X, y):
+        """A new engine with the same parameters for the grown ``X``, ``y``"""
+        return type(self)(self.params).fit(X, y)
+
+
+class ForestEngine(Engine):
+    """The random forest; predictions come from its ``FlatForest`` export"""
+
+    name = 'forest'
+    label = 'Random Forest'
+    default_params = MODEL_PARAMS
+
+    def _fit(self, X, y):
+        self.model = fit_forest(X, y, self.params)
+        self.forest = FlatForest.from_sklearn(self.model)
+
+    def predict_one(self, row):
+        return self.forest.predict_one(row)
+
+    def predict_batch(self, X):
+        return self.forest.predict(X)
+
+    def __getstate__(self):
+        # The array export is rebuilt from the forest on load
+        state = dict(self.__dict__)
+        state.pop('forest', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'model' in state:
+            self.forest = FlatForest.from_sklearn(self.model)
+
+
+class HistGradientBoostingEngine(Engine):
+    """scikit-learn's histogram gradient boosting"""
+
+    name = 'hgb'
+    label = 'Histogram Gradient Boosting'
+    # The series only has a few dozen rows, so leaves must be allowed to be small
+    default_params = {'max_iter': 200, 'learning_rate': 0.05, 'min_samples_leaf': 5, 'random_state': 42}
+
+    def _fit(self, X, y):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        self.model = HistGradientBoostingRegressor(**self.params).fit(X, y)
+
+    def predict_one(self, row):
+        return float(self.model.predict(np.asarray(row, dtype=np.float64).reshape(1, -1))[0])
+
+    def predict_batch(self, X):
+        return self.model.predict(np.asarray(X, dtype=np.float64))
+
+
+class LinearEngine(Engine):
+    """Least squares on standardised features; ``alpha`` > 0 adds a ridge penalty"""
+
+    name = 'linear'
+    label = 'linear least-squares'
+    default_params = {'alpha': 1.0}
+
+    def _fit(self, X, y):
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = (X - mean) / scale
+        target = y - y.mean()
+        alpha = float(self.params.get('alpha', 0.0))
+        if alpha > 0:
+            # Ridge as an augmented least-squares problem
+            Z = np.vstack([Z, np.sqrt(alpha) * np.eye(Z.shape[1])])
+            target = np.concatenate([target, np.zeros(X.shape[1])])
+        weights = np.linalg.lstsq(Z, target, rcond=None)[0]
+        self.coef = weights / scale
+        self.intercept = float(y.mean() - mean @ self.coef)
+
+    def predict_one(self, row):
+        return float(np.dot(np.ravel(row), self.coef)) + self.intercept
+
+    def predict_batch(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+ENGINES = {engine.name: engine for engine in (ForestEngine, HistGradientBoostingEngine, LinearEngine)}
+
+
+def make_engine(name=DEFAULT_ENGINE, params=None):
+    """An unfitted engine by name, with its default parameters unless ``params`` is given"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}; choose from {', '.join(ENGINES)}")
+    return ENGINES[name](params)
+
+
+def engine_params(name=DEFAULT_ENGINE):
+    """Model parameters that select engine ``name`` with its defaults.
+
+    The forest's are plain ``MODEL_PARAMS``, so its model keys (and artifacts)
+    stay the same as before engines existed.
+    """
+    if name == DEFAULT_ENGINE:
+        return dict(MODEL_PARAMS)
+    make_engine(name)  # validate the name
+    return dict(ENGINES[name].default_params, engine=name)
+
+
+def split_params(params):
+    """``(engine name, engine parameters)`` from model parameters that may contain ``'engine'``"""
+    params = dict(MODEL_PARAMS if params is None else params)
+    return params.pop('engine', DEFAULT_ENGINE), params
+
+
+def fit_engine(X, y, params=None):
+    """Fit the engine selected by ``params`` (the forest when it names none)"""
+    name, params = split_params(params)
+    return make_engine(name, params).fit(X, y)
+
+
+def deserialize(data):
+    engine = pickle.loads(data)
+    if not isinstance(engine, Engine):
+        raise TypeError(f"Not a serialized engine: {type(engine).__name__}")
+    return engine
+
+
+def median_seconds(fn, repeats):
+    """Median wall time of ``repeats`` calls to ``fn``, in seconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def measure_costs(engine, X, repeats=200):
+    """Training and inference cost of a fitted ``engine`` on feature rows ``X``"""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    row = X[-1:].copy()
+    return {'engine': engine.name,
+            'fit_ms': engine.fit_seconds * 1e3 if engine.fit_seconds is not None else None,
+            'predict_one_us': median_seconds(lambda: engine.predict_one(row), repeats) * 1e6,
+            'predict_batch_us_per_row': median_seconds(lambda: engine.predict_batch(X),
+                                                       max(1, repeats // 10)) * 1e6 / len(X),
+            'size_bytes': len(engine.serialize())}
@@ -0,0 +1,61 @@
+"""
+Solar maximum/minimum detection on long series.
+
+A point is a maximum when it is strictly greater than every other point within
+``window`` steps on either side and above ``max_threshold``; minima are the
+mirror image below ``min_threshold``. The first and last points only need to
+beat their single neighbour. The window comparison is done with
+``sliding_window_view`` so the cost is linear in the length of the series.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _neighbour_extremes(values, window):
+    """Max and min of the ``window`` points on each side of every interior point"""
+    windows = sliding_window_view(values, 2 * window + 1)
+    neighbours = np.concatenate([windows[:, :window], windows[:, window + 1:]], axis=1)
+    return neighbours.max(axis=1), neighbours.min(axis=1)
+
+
+def find_extrema(years, values, window=3, max_threshold=40, min_threshold=25, limit=6):
+    """Return ``(maxima, minima)`` as lists of ``(year, value)`` tuples.
+
+    Maxima are sorted by value descending and minima ascending; ``limit``
+    keeps only the first few of each (None keeps all).
+    """
+    years = np.asarray(years)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < 3:
+        return [], []
+
+    is_max = np.zeros(n, dtype=bool)
+    is_min = np.zeros(n, dtype=bool)
+
+    # Interior points: strictly above/below every neighbour within the window
+    if n > 2 * window:
+        center = values[window:n - window]
+        is_max[window:n - window] = center > max_threshold
+        is_min[window:n - window] = center < min_threshold
+        if window > 0:
+            highest, lowest = _neighbour_extremes(values, window)
+            is_max[window:n - window] &= center > highest
+            is_min[window:n - window] &= center < lowest
+
+    # Boundaries only compare against their single neighbour
+    is_max[0] |= values[0] > values[1] and values[0] > max_threshold
+    is_min[0] |= values[0] < values[1] and values[0] < min_threshold
+    is_max[-1] |= values[-1] > values[-2] and values[-1] > max_threshold
+    is_min[-1] |= values[-1] < values[-2] and values[-1] < min_threshold
+
+    return (_ranked(years, values, is_max, descending=True, limit=limit),
+            _ranked(years, values, is_min, descending=False, limit=limit))
+
+
+def _ranked(years, values, mask, descending, limit):
+    idx = np.flatnonzero(mask)
+    order = np.argsort(-values[idx] if descending else values[idx], kind='stable')
+    points = dict.fromkeys((int(years[i]), float(values[i])) for i in idx[order])
+    points = list(points)
+    return points if limit is None else points[:limit]
@@ -0,0 +1,129 @@
+"""
+Feature pipeline shared by every model in the project.
+
+For each year the model sees its position in the 11-year cycle, the five
+previous values, 3/5/11-year moving averages (over however many values exist
+so far, like ``rolling(..., min_periods=1)``) and the cycle position as
+sin/cos. ``feature_matrix`` writes all 14 features straight into one
+preallocated array: lags are shifted views of the series and the moving
+averages share one running window sum built from the same views, so no
+intermediate DataFrame columns are created. Window sums are used instead of a
+global cumulative sum, whose rounding error grows with the series length.
+``iter_feature_chunks`` produces the same rows a chunk at a time for series
+too long to hold twice in memory (``sweep.py`` streams its feature file this
+way), and ``append_features`` computes only the rows of newly appended years.
+"""
+import numpy as np
+import pandas as pd
+
+CYCLE_ORIGIN = 1970
+CYCLE_LENGTH = 11
+LAGS = (1, 2, 3, 4, 5)
+MA_WINDOWS = (3, 5, 11)
+# Past values a row needs besides its own (the longest moving-average window)
+CONTEXT = max(MA_WINDOWS) - 1
+
+FEATURE_COLUMNS = ['Cycle_Position', 'Years_Since_1970', 'Cycle_Number',
+                   'Lag_1', 'Lag_2', 'Lag_3', 'Lag_4', 'Lag_5',
+                   'MA_3', 'MA_5', 'MA_11', 'Sin_Cycle', 'Cos_Cycle', 'Trend']
+_INTEGER_COLUMNS = ('Cycle_Position', 'Years_Since_1970', 'Cycle_Number', 'Trend')
+
+_SIN_CYCLE = np.sin(2 * np.pi * np.arange(CYCLE_LENGTH) / CYCLE_LENGTH)
+_COS_CYCLE = np.cos(2 * np.pi * np.arange(CYCLE_LENGTH) / CYCLE_LENGTH)
+
+
+def _moving_averages(values, out):
+    """Write the trailing ``MA_WINDOWS`` means into ``out[:, 8:11]``.
+
+    One running window sum is grown a shifted view at a time, and each
+    average is taken when the window reaches its length. Early rows average
+    over fewer values, like ``min_periods=1``.
+    """
+    n = len(values)
+    window_sum = values.copy()
+    positions = np.arange(1, n + 1)
+    for width in range(1, max(MA_WINDOWS) + 1):
+        if width > 1 and width - 1 < n:
+            window_sum[width - 1:] += values[:n - width + 1]
+        if width in MA_WINDOWS:
+            out[:, 8 + MA_WINDOWS.index(width)] = window_sum / np.minimum(positions, width)
+
+
+def feature_matrix(years, values, dtype=np.float64, out=None):
+    """Compute the ``FEATURE_COLUMNS`` for every year as an ``(n, 14)`` array.
+
+    Rows without enough history for all lags contain NaN in the missing lag
+    columns, exactly like the DataFrame version. ``out`` may be a
+    preallocated array of the right shape to write into.
+    """
+    years = np.asarray(years, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if out is None:
+        out = np.empty((n, len(FEATURE_COLUMNS)), dtype=dtype)
+
+    offset = years - CYCLE_ORIGIN
+    cycle_pos = offset % CYCLE_LENGTH
+    out[:, 0] = cycle_pos
+    out[:, 1] = offset
+    out[:, 2] = offset // CYCLE_LENGTH
+
+    for i, lag in enumerate(LAGS):
+        column = out[:, 3 + i]
+        column[:lag] = np.nan
+        column[lag:] = values[:n - lag] if lag < n else values[:0]
+
+    _moving_averages(values, out)
+
+    out[:, 11] = _SIN_CYCLE[cycle_pos]
+    out[:, 12] = _COS_CYCLE[cycle_pos]
+    out[:, 13] = offset
+    return out
+
+
+def iter_feature_chunks(years, values, chunk_rows=100_000, dtype=np.float64):
+    """Yield ``(start, matrix)`` blocks of ``feature_matrix`` rows.
+
+    Each block is computed from its own rows plus the ``CONTEXT`` values
+    before it, so the concatenated blocks equal the full matrix while only
+    one block is held in memory at a time.
+    """
+    years = np.asarray(years)
+    values = np.asarray(values)
+    for start in range(0, len(values), chunk_rows):
+        stop = min(start + chunk_rows, len(values))
+        lo = max(0, start - CONTEXT)
+        block = feature_matrix(years[lo:stop], values[lo:stop], dtype=dtype)
+        yield start, block[start - lo:]
+
+
+def create_features(df):
+    """Add the ``FEATURE_COLUMNS`` to a copy of a Year/Sunspot_Number DataFrame"""
+    matrix = feature_matrix(df['Year'].to_numpy(), df['Sunspot_Number'].to_numpy())
+    columns = {}
+    for i, name in enumerate(FEATURE_COLUMNS):
+        column = matrix[:, i]
+        columns[name] = column.astype(np.int64) if name in _INTEGER_COLUMNS else column
+    base = df.drop(columns=[c for c in FEATURE_COLUMNS if c in df.columns])
+    return pd.concat([base, pd.DataFrame(columns, index=df.index)], axis=1)
+
+
+def append_features(df_features, df):
+    """``create_features(df)`` for a ``df`` that extends the rows of ``df_features``.
+
+    Features only look backwards, so the existing rows are kept as they are.
+    Only the new rows are computed, from themselves plus the ``CONTEXT``
+    values before them.
+    """
+    n_old = len(df_features)
+    lo = max(0, n_old - CONTEXT)
+    tail = create_features(df.iloc[lo:])
+    return pd.concat([df_features, tail.iloc[n_old - lo:]])
+
+
+def training_arrays(df_features):
+    """Feature matrix and targets for the rows that have every lag available"""
+    X = df_features[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = df_features['Sunspot_Number'].to_numpy(dtype=np.float64)
+    complete = ~np.isnan(X).any(axis=1)
+    return X[complete], y[complete]
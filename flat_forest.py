@@ -0,0 +1,130 @@
+"""
+Array-backed random forest for fast single-row inference.
+
+``RandomForestRegressor.predict`` spends far more time on input validation,
+joblib dispatch and per-tree Python calls than on walking the trees when it is
+given a single row, which is exactly what the autoregressive rollout does. A
+``FlatForest`` copies every tree of a fitted forest into one set of contiguous
+node arrays and walks all trees at once with vectorised NumPy, one tree level
+per step.
+
+Predictions match scikit-learn exactly: inputs are rounded to float32 like
+sklearn does before comparing against the split thresholds, and tree outputs
+are summed in estimator order before dividing by the number of trees.
+"""
+import numpy as np
+
+
+class FlatForest:
+    """All trees of a fitted forest stored as flat node arrays.
+
+    Leaves get an infinite threshold and point to themselves, so every tree
+    can be walked for ``max_depth`` steps without checking for leaves.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.n_trees = len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Export a fitted single-output ``RandomForestRegressor`` (or any
+        forest exposing ``estimators_``)"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left < 0
+            own = np.arange(offset, offset + n)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.concatenate(features), np.concatenate(thresholds),
+                   np.concatenate(lefts), np.concatenate(rights),
+                   np.concatenate(values), np.array(roots), max_depth,
+                   model.n_features_in_)
+
+    def _leaves(self, X):
+        """Leaf index per (row, tree) for a 2-D float64 array ``X``"""
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _prepare(self, X):
+        # sklearn casts inputs to float32 before comparing them to the thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        return X
+
+    def predict(self, X):
+        """Mean prediction of all trees for each row of ``X``"""
+        leaf_values = self.value[self._leaves(self._prepare(X))]
+        # Sum trees in order, like sklearn's per-estimator accumulation
+        return np.add.accumulate(leaf_values, axis=1)[:, -1] / self.n_trees
+
+    def predict_trees(self, X):
+        """Every tree's prediction for every row of ``X``, shaped ``(n_trees, n_rows)``"""
+        return self.value[self._leaves(self._prepare(X))].T
+
+    def predict_one(self, row):
+        """Prediction for a single feature row, as a Python float"""
+        x = np.asarray(row, dtype=np.float32).astype(np.float64).reshape(-1)
+        node = self.roots
+        for _ in range(self.max_depth):
+            go_left = x[self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return float(np.add.accumulate(self.value[node])[-1] / self.n_trees)
+
+    def predict_each(self, X):
+        """Tree ``i``'s prediction for row ``i`` of ``X``, which has one row per tree"""
+        X = self._prepare(X)
+        if X.shape[0] != self.n_trees:
+            raise ValueError(f"Expected one row per tree ({self.n_trees}), got {X.shape[0]}")
+        rows = np.arange(self.n_trees)
+        node = self.roots
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def subset(self, trees):
+        """A new forest made of the trees at positions ``trees``"""
+        ends = np.append(self.roots[1:], len(self.value))
+        parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'value')}
+        roots = []
+        offset = 0
+        for t in trees:
+            lo, hi = self.roots[t], ends[t]
+            shift = offset - lo
+            parts['feature'].append(self.feature[lo:hi])
+            parts['threshold'].append(self.threshold[lo:hi])
+            parts['left'].append(self.left[lo:hi] + shift)
+            parts['right'].append(self.right[lo:hi] + shift)
+            parts['value'].append(self.value[lo:hi])
+            roots.append(offset)
+            offset += hi - lo
+        return FlatForest(*(np.concatenate(parts[name]) for name in parts),
+                          np.array(roots), self.max_depth, self.n_features)
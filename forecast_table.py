@@ -0,0 +1,66 @@
+"""
+Precomputed forecast trajectory.
+
+The forecast is autoregressive, so answering "what about year N" means rolling
+the model forward from the end of the data to N. The table does that rollout
+once, up to a fixed horizon, and stores the result in a flat array indexed by
+``year - first_year`` so single years and ranges become lookups and slices.
+"""
+import numpy as np
+import pandas as pd
+
+
+class ForecastTable:
+    """Historical values plus a precomputed forecast up to ``last_year``"""
+
+    def __init__(self, history_years, history_values, first_year, values):
+        self.history = dict(zip((int(y) for y in history_years), (float(v) for v in history_values)))
+        self.first_year = int(first_year)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.last_year = self.first_year + len(self.values) - 1
+
+    @classmethod
+    def build(cls, model, df_features, end_year, rollout):
+        """Roll ``model`` forward once from the end of the data to ``end_year``.
+
+        ``rollout(model, df_features, start_year, end_year)`` must return a
+        DataFrame with Year and Sunspot_Number columns, like
+        ``app.predict_future_years``.
+        """
+        first_year = int(df_features['Year'].max()) + 1
+        if end_year >= first_year:
+            future = rollout(model, df_features, first_year, end_year)
+            values = future['Sunspot_Number'].to_numpy(dtype=np.float64)
+        else:
+            values = np.empty(0, dtype=np.float64)
+        return cls(df_features['Year'].to_numpy(), df_features['Sunspot_Number'].to_numpy(),
+                   first_year, values)
+
+    def value(self, year):
+        """Sunspot number for one year, or None if the table does not cover it"""
+        year = int(year)
+        if year < self.first_year:
+            return self.history.get(year)
+        if year > self.last_year:
+            return None
+        return float(self.values[year - self.first_year])
+
+    def lookup(self, years):
+        """Values for an arbitrary list of years, None where not covered"""
+        return [self.value(year) for year in years]
+
+    def slice(self, start_year, end_year):
+        """Forecast years and values for ``start_year..end_year`` (inclusive)"""
+        if start_year < self.first_year or end_year > self.last_year:
+            raise ValueError(f"Forecast covers {self.first_year}-{self.last_year}, "
+                             f"got {start_year}-{end_year}")
+        if end_year < start_year:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        lo = start_year - self.first_year
+        hi = end_year - self.first_year + 1
+        return np.arange(start_year, end_year + 1), self.values[lo:hi]
+
+    def frame(self, start_year, end_year):
+        """Forecast for ``start_year..end_year`` as a Year/Sunspot_Number DataFrame"""
+        years, values = self.slice(start_year, end_year)
+        return pd.DataFrame({'Year': years, 'Sunspot_Number': values})
@@ -0,0 +1,29 @@
+"""
+gunicorn settings, picked up automatically by ``gunicorn app:app``.
+
+The app is imported and warmed once in the master process (``preload_app``),
+so every worker is forked with the model and forecast already in memory. That
+includes the workers gunicorn starts when it recycles old ones. Set
+SUNSPOT_PRELOAD=0 to import the app in each worker instead.
+
+Each worker serves SUNSPOT_THREADS requests at once (gthread workers). Chart
+rendering is thread-safe and runs on the app's render pool, so threads do not
+have to be traded for processes.
+
+SUNSPOT_WARM_AFTER_FORK=1 also renders the default chart in each worker right
+after it is forked, so the first page view is served from the plot cache.
+"""
+import os
+
+preload_app = os.environ.get('SUNSPOT_PRELOAD', '1') != '0'
+threads = int(os.environ.get('SUNSPOT_THREADS', '4'))
+
+
+def post_fork(server, worker):
+    if os.environ.get('SUNSPOT_WARM_AFTER_FORK', '0') != '1':
+        return
+    try:
+        from app import warm
+        warm(plots=True)
+    except Exception as e:
+        print(f"Post-fork warm-up failed in worker {worker.pid}: {e}")
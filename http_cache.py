@@ -0,0 +1,55 @@
+"""
+HTTP caching helpers: deterministic ETags, conditional GET and precompressed
+response bodies.
+
+A page is fully determined by the model/data version and the request's
+parameters, so its ETag can be computed *before* anything is rendered. A
+matching ``If-None-Match`` is answered with 304 straight away. A page is
+compressed once, when it is first rendered. Its gzip (and, if the optional
+``brotli`` package is installed, brotli) variants are stored next to the
+identity body, so repeat views never re-render or re-compress.
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Preferred first when the client accepts several
+ENCODINGS = ('br', 'gzip')
+
+
+def make_etag(*parts):
+    """Strong ETag value from the parts that determine a response"""
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:24]
+
+
+def compress(body, encoding):
+    if encoding == 'gzip':
+        # mtime=0 keeps the bytes identical across workers and restarts
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=11)
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def available_encodings():
+    return tuple(e for e in ENCODINGS if e != 'br' or brotli is not None)
+
+
+def pick_encoding(request):
+    """Best precompressed encoding the client accepts, or None for identity"""
+    for encoding in available_encodings():
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def cache_headers(response, etag, cache_control, vary_encoding=False):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    if vary_encoding:
+        response.vary.add('Accept-Encoding')
+    return response
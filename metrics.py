@@ -0,0 +1,132 @@
+"""
+Lightweight per-stage timing and Prometheus metrics.
+
+Wrap a piece of work in ``with stage('plot'):`` to record its duration in a
+histogram. Inside a Flask request, the duration is also reported back to the
+browser in the ``Server-Timing`` response header. ``init_app`` installs the
+request hooks and serves every histogram, counter and registered gauge at
+``/metrics`` in the Prometheus text format.
+
+Recording costs two ``perf_counter`` calls and a short lock, so it is meant to
+stay on in production. Set ``SUNSPOT_METRICS=0`` to turn it off completely.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+
+ENABLED = os.environ.get('SUNSPOT_METRICS', '1') != '0'
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label value"""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            series[0][bisect_left(BUCKETS, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_value, (counts, total, count) in sorted(self._series.items()):
+                label = f'{self.label}="{label_value}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{label}}} {total}')
+                lines.append(f'{self.name}_count{{{label}}} {count}')
+        return lines
+
+
+stage_seconds = Histogram('sunspot_stage_seconds', 'Time spent in each stage of request handling', 'stage')
+request_seconds = Histogram('sunspot_request_seconds', 'Total request handling time', 'endpoint')
+
+# name -> (help, type, callable returning {label_string: value})
+_gauges = {}
+
+
+def register_gauge(name, help_text, collect, kind='gauge'):
+    """Expose ``collect()`` (a dict of label string -> value) at /metrics.
+
+    Label strings are either '' or Prometheus label pairs like 'cache="plot"'.
+    """
+    _gauges[name] = (help_text, kind, collect)
+
+
+class stage:
+    """Context manager timing one named stage"""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if ENABLED:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if not ENABLED:
+            return False
+        seconds = time.perf_counter() - self.start
+        stage_seconds.observe(self.name, seconds)
+        if has_request_context():
+            timings = g.setdefault('server_timing', [])
+            timings.append((self.name, seconds))
+        return False
+
+
+def render_metrics():
+    lines = stage_seconds.render() + request_seconds.render()
+    for name, (help_text, kind, collect) in sorted(_gauges.items()):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(collect().items()):
+            lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Install Server-Timing hooks and the /metrics endpoint on a Flask app"""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _server_timing(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        request_seconds.observe(request.endpoint or 'unknown', total)
+        parts = [f'{name};dur={seconds * 1e3:.2f}' for name, seconds in g.get('server_timing', [])]
+        parts.append(f'total;dur={total * 1e3:.2f}')
+        response.headers['Server-Timing'] = ', '.join(parts)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,244 @@
+"""
+Process-wide registry of fitted sunspot models.
+
+Fitting the forest is by far the most expensive thing a request can do, so
+the registry fits it once per (dataset, hyperparameters) pair and hands the
+same fitted model to every caller. Entries are keyed by a hash of the data
+and the parameters, so a model is only rebuilt when one of them changes.
+When the data only grew by new years at the end, an ``extend`` hook can
+update the previous entry's model instead of fitting from scratch. An
+updated model differs from a fresh fit on the same data, so it gets its own
+key derived from the entry it grew from (see ``extension_key``).
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from singleflight import SingleFlight
+
+
+def dataset_key(df, params):
+    """Stable hash of the Year/Sunspot_Number columns plus the model parameters"""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(df['Year'].to_numpy(dtype=np.float64)).tobytes())
+    h.update(np.ascontiguousarray(df['Sunspot_Number'].to_numpy(dtype=np.float64)).tobytes())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def extension_key(base_key, df, n, tag):
+    """Key of the model made by extending ``base_key`` with rows ``n:`` of ``df`` as ``tag``"""
+    h = hashlib.sha256(base_key.encode('utf-8'))
+    h.update(np.ascontiguousarray(df['Year'].to_numpy(dtype=np.float64)[n:]).tobytes())
+    h.update(np.ascontiguousarray(df['Sunspot_Number'].to_numpy(dtype=np.float64)[n:]).tobytes())
+    h.update(tag.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class ModelEntry:
+    """A fitted model together with the data and features it was trained on"""
+
+    def __init__(self, key, df, df_features, model, params, load_model=None):
+        self.key = key
+        self.df = df
+        self.df_features = df_features
+        self._model = model
+        self._load_model = load_model
+        self.params = params
+        # Derived data (e.g. the forecast table) lives on the entry so it is
+        # dropped together with the model it was computed from
+        self.forecast = None
+        self.flat_forest = None
+        self.bands = None
+        # The direct multi-horizon model and its forecast/bands (direct.py)
+        self.direct = None
+        self.direct_forecast = None
+        self.direct_bands = None
+
+    @property
+    def model(self):
+        """The fitted model, loaded on first access when the entry was built without it"""
+        if self._model is None and self._load_model is not None:
+            self._model = self._load_model()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+
+class ModelRegistry:
+    """Fits models on demand and keeps them for the lifetime of the process.
+
+    ``build_features(df)`` and ``fit(df_features, params)`` are supplied by the
+    caller so the registry stays independent of the modelling code. When
+    ``cache_dir`` is set, fitted models are also pickled there and reloaded
+    on the next start instead of being refitted; ``cache_tag`` (e.g. the
+    scikit-learn version) is part of the file name so stale pickles are ignored.
+
+    Concurrent requests for the same missing key share one build; callers
+    waiting on it give up after ``timeout`` seconds. Builds for different keys
+    run independently.
+
+    ``extend(entry, df)``, if given, is used when ``df`` appends rows to the
+    data of an entry with the same parameters. It returns ``(df_features,
+    model, tag)`` for ``df``, and the entry it extended is dropped. ``tag`` is
+    None when the model is what a fresh fit would give (e.g. a refit); then
+    the entry keeps the usual dataset key. Otherwise the entry is keyed by
+    ``extension_key`` so one key never names two different models, ``get``
+    finds it through an alias from the dataset key, and it is not written to
+    ``cache_dir`` (after a restart the data is fitted from scratch).
+    ``on_replace(entry)`` is called with the dropped entry once its
+    replacement is installed, e.g. to drop caches built from the old model.
+    """
+
+    def __init__(self, build_features, fit, default_params, cache_dir=None, cache_tag='', max_entries=4,
+                 timeout=None, extend=None, on_replace=None):
+        self.build_features = build_features
+        self.fit = fit
+        self.default_params = dict(default_params)
+        self.cache_dir = cache_dir
+        self.cache_tag = cache_tag
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Dataset key -> key of the extended entry serving that data
+        self._aliases = {}
+        self._lock = threading.Lock()
+        self.flight = SingleFlight()
+        self.timeout = timeout
+        self.extend = extend
+        self.on_replace = on_replace
+        self.hits = 0
+        self.builds = 0
+        self.disk_loads = 0
+        self.extensions = 0
+
+    def get(self, df, params=None):
+        """Return the entry for ``df`` and ``params``, fitting it if needed"""
+        params = dict(self.default_params if params is None else params)
+        key = dataset_key(df, params)
+
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        built = []
+
+        def build():
+            built.append(True)
+            return self._build(key, df, params)
+
+        entry = self.flight.do(key, build, self.timeout)
+        if not built:
+            # Served by another request's build
+            self.hits += 1
+        return entry
+
+    def _build(self, key, df, params):
+        # A build may have finished between the lookup and joining the flight
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        model = self._load(key)
+        base = self._extended_entry(df, params) if model is None and self.extend is not None else None
+        entry_key = key
+        if base is not None:
+            df_features, model, tag = self.extend(base, df)
+            self.extensions += 1
+            if tag is None:
+                self._save(key, model)
+            else:
+                entry_key = extension_key(base.key, df, len(base.df), tag)
+        else:
+            df_features = self.build_features(df)
+            if model is None:
+                model = self.fit(df_features, params)
+                self.builds += 1
+                self._save(key, model)
+            else:
+                self.disk_loads += 1
+
+        entry = ModelEntry(entry_key, df, df_features, model, params)
+        self._store(entry, alias=key if entry_key != key else None, replaced=base)
+        if base is not None and self.on_replace is not None:
+            # Only now can no request pick up the old entry and refill its caches
+            self.on_replace(base)
+        return entry
+
+    def _lookup(self, key):
+        with self._lock:
+            return self._entries.get(self._aliases.get(key, key))
+
+    def _store(self, entry, alias=None, replaced=None):
+        with self._lock:
+            if replaced is not None:
+                self._entries.pop(replaced.key, None)
+            self._entries[entry.key] = entry
+            if alias is not None:
+                self._aliases[alias] = entry.key
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._aliases = {alias: key for alias, key in self._aliases.items() if key in self._entries}
+
+    def _extended_entry(self, df, params):
+        """The most recent entry with ``params`` whose data ``df`` appends rows to, if any"""
+        years = df['Year'].to_numpy()
+        values = df['Sunspot_Number'].to_numpy()
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in reversed(entries):
+            n = len(entry.df)
+            if (entry.params == params and 0 < n < len(df)
+                    and np.array_equal(entry.df['Year'].to_numpy(), years[:n])
+                    and np.array_equal(entry.df['Sunspot_Number'].to_numpy(), values[:n])):
+                return entry
+        return None
+
+    def install(self, key, df, df_features, params, model=None, load_model=None):
+        """Add a prebuilt entry (e.g. from an artifact) so ``get`` returns it for ``key``"""
+        entry = ModelEntry(key, df, df_features, model, dict(params), load_model)
+        self._store(entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def _path(self, key):
+        suffix = f'-{self.cache_tag}' if self.cache_tag else ''
+        return os.path.join(self.cache_dir, f'model-{key}{suffix}.pkl')
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as fh:
+                return pickle.load(fh)
+        except Exception as e:
+            print(f"Ignoring unreadable model cache {path}: {e}")
+            return None
+
+    def _save(self, key, model):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so other workers never read a partial pickle
+            tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as fh:
+                pickle.dump(model, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not write model cache: {e}")
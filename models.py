@@ -0,0 +1,29 @@
+"""
+Model construction shared by the web app, backtests and sweeps.
+
+scikit-learn is imported when a model is first fitted, not when this module is
+imported, so a process serving a prebuilt model never pays for it.
+"""
+import copy
+
+MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42, 'max_depth': 10}
+
+
+def fit_forest(X, y, params=None):
+    """Fit the project's random forest on a feature matrix and targets"""
+    from sklearn.ensemble import RandomForestRegressor
+    model = RandomForestRegressor(**(MODEL_PARAMS if params is None else params))
+    model.fit(X, y)
+    return model
+
+
+def extend_forest(model, X, y, n_trees):
+    """A copy of a fitted forest with ``n_trees`` more trees fitted on ``X``, ``y`` (warm start).
+
+    The existing trees are kept as they are; ``model`` itself is not changed.
+    """
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
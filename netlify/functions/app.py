@@ -9,6 +9,10 @@ import os
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.insert(0, project_root)
 
+# Serve the model written by the build step (python build_artifacts.py) so a
+# cold start loads arrays from disk instead of fitting the forest
+os.environ.setdefault('SUNSPOT_ARTIFACT_DIR', os.path.join(project_root, 'artifacts'))
+
 # Import the main app
 from app import app
 
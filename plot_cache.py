@@ -0,0 +1,106 @@
+"""
+Bounded LRU cache for rendered plots.
+
+A chart depends only on the model/data version and the requested end year, so
+there are only a few hundred distinct renders. They are kept in memory in LRU
+order and, when ``disk_dir`` is set, also written to disk so that other
+workers and restarted processes can reuse them.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class PlotCache:
+    """In-memory LRU of rendered image bytes with an optional on-disk tier"""
+
+    def __init__(self, max_entries=256, disk_dir=None, suffix='.png'):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.suffix = suffix
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached bytes for ``key`` or None, counting a hit or miss"""
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read(key)
+        with self._lock:
+            if data is not None:
+                self.disk_hits += 1
+                self._store(key, data)
+            else:
+                self.misses += 1
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._store(key, data)
+        self._write(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def discard_prefix(self, prefix):
+        """Drop every entry whose key starts with ``prefix``, in memory and on disk"""
+        with self._lock:
+            keys = [key for key in self._items if key.startswith(prefix)]
+            for key in keys:
+                del self._items[key]
+        if self.disk_dir:
+            try:
+                names = [name for name in os.listdir(self.disk_dir) if name.startswith(f'plot-{prefix}')]
+            except OSError:
+                names = []
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                except OSError:
+                    pass
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'hits': self.hits,
+                    'disk_hits': self.disk_hits, 'misses': self.misses}
+
+    def _store(self, key, data):
+        self._items[key] = data
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f'plot-{key}{self.suffix}')
+
+    def _read(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), 'rb') as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def _write(self, key, data):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # Write to a temporary file first so other workers never read a partial image
+            tmp_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not write plot cache: {e}")
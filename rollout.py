@@ -0,0 +1,132 @@
+"""
+Autoregressive rollout engine shared by the web app, the CLI script and the
+Streamlit app.
+
+Each forecast year needs the last five values as lags and the 3/5/11-year
+moving averages of everything seen so far, including earlier predictions.
+Instead of growing a DataFrame and re-slicing it every year, the engine keeps
+the last 11 values in a mirrored NumPy ring buffer (every value is stored
+twice, ``WINDOW`` slots apart) so the most recent values are always available
+as one contiguous, chronologically ordered slice. The moving averages are
+summed over that slice with the same NumPy reduction pandas uses for
+``tail(n).mean()``, which keeps the output bit-for-bit identical to the
+original DataFrame loops while each step costs a constant amount of work.
+"""
+import numpy as np
+
+CYCLE_ORIGIN = 1970
+CYCLE_LENGTH = 11
+WINDOW = 11  # Longest look-back any feature needs (MA_11)
+N_LAGS = 5
+N_FEATURES = 14
+
+# sin/cos of the cycle position, computed exactly like the feature pipeline does
+_SIN_CYCLE = [np.sin(2 * np.pi * pos / CYCLE_LENGTH) for pos in range(CYCLE_LENGTH)]
+_COS_CYCLE = [np.cos(2 * np.pi * pos / CYCLE_LENGTH) for pos in range(CYCLE_LENGTH)]
+
+
+def model_predictor(model):
+    """Wrap a fitted estimator as a ``predict(row) -> float`` callable"""
+    if hasattr(model, 'predict_one'):
+        return model.predict_one
+
+    def predict(row):
+        return float(model.predict(row)[0])
+    return predict
+
+
+class Rollout:
+    """Resumable recursive forecast.
+
+    ``predict`` receives a preallocated ``(1, 14)`` float64 feature row and
+    returns the next value. ``history`` is the observed series in
+    chronological order and ``start_year`` the first year to forecast.
+    Forecasts are reported clipped at zero; by default the raw prediction is
+    what feeds the following years' lags (``predict_future_years``), while
+    ``feed_clipped=True`` feeds the clipped value (``predict_single_year``).
+    """
+
+    def __init__(self, predict, history, start_year, feed_clipped=False):
+        history = np.asarray(history, dtype=np.float64)
+        if history.size == 0:
+            raise ValueError("Rollout needs at least one observed value")
+        self.predict = predict
+        self.feed_clipped = feed_clipped
+        self.start_year = int(start_year)
+        self.next_year = self.start_year
+
+        self._buf = np.zeros(2 * WINDOW, dtype=np.float64)
+        self._count = 0
+        self._write = 0
+        for value in history[-WINDOW:]:
+            self._push(value)
+
+        self._row = np.empty((1, N_FEATURES), dtype=np.float64)
+        self._values = np.empty(16, dtype=np.float64)
+        self._size = 0
+
+    def _push(self, value):
+        self._buf[self._write] = value
+        self._buf[self._write + WINDOW] = value
+        self._write = (self._write + 1) % WINDOW
+        if self._count < WINDOW:
+            self._count += 1
+
+    def _window(self):
+        """Most recent values, oldest first, as a contiguous view"""
+        start = (self._write - self._count) % WINDOW
+        return self._buf[start:start + self._count]
+
+    def _fill_row(self, year):
+        window = self._window()
+        count = self._count
+        last = window[-1]
+        offset = year - CYCLE_ORIGIN
+        cycle_pos = offset % CYCLE_LENGTH
+
+        row = self._row[0]
+        row[0] = cycle_pos
+        row[1] = offset
+        row[2] = offset // CYCLE_LENGTH
+        for lag in range(N_LAGS):
+            row[3 + lag] = window[-1 - lag] if count > lag else last
+        row[8] = window[-3:].sum() / min(count, 3)
+        row[9] = window[-5:].sum() / min(count, 5)
+        row[10] = window.sum() / count
+        row[11] = _SIN_CYCLE[cycle_pos]
+        row[12] = _COS_CYCLE[cycle_pos]
+        row[13] = offset
+        return self._row
+
+    def advance(self, end_year):
+        """Forecast every year up to ``end_year`` that has not been forecast yet"""
+        n_new = int(end_year) - self.next_year + 1
+        if n_new <= 0:
+            return
+        if self._size + n_new > len(self._values):
+            grown = np.empty(max(2 * len(self._values), self._size + n_new), dtype=np.float64)
+            grown[:self._size] = self._values[:self._size]
+            self._values = grown
+
+        for year in range(self.next_year, int(end_year) + 1):
+            pred = self.predict(self._fill_row(year))
+            clipped = max(0.0, pred)
+            self._values[self._size] = clipped
+            self._size += 1
+            self._push(clipped if self.feed_clipped else pred)
+        self.next_year = int(end_year) + 1
+
+    @property
+    def years(self):
+        return np.arange(self.start_year, self.next_year)
+
+    @property
+    def values(self):
+        return self._values[:self._size]
+
+
+def rollout(predict, history, start_year, end_year, feed_clipped=False):
+    """Forecast ``start_year..end_year``; returns ``(years, values)`` arrays"""
+    engine = Rollout(predict, history, start_year, feed_clipped=feed_clipped)
+    engine.advance(end_year)
+    return engine.years, engine.values.copy()
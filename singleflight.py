@@ -0,0 +1,75 @@
+"""
+Request coalescing ("single flight") for expensive computations.
+
+When many requests need the same result at the same moment (a dashboard
+loading, the first requests after a deploy or cache expiry), only the first
+caller runs the computation. Callers that arrive while it is in flight wait
+for it and get the same result, or the same exception. Once it finishes the
+key is forgotten; keeping results is the job of the caches around it.
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one ``fn()`` per key at a time and shares its outcome"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0  # computations actually run
+        self.shared = 0    # callers served by another caller's computation
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """Return ``fn()``, or the result of an identical in-flight call.
+
+        Waiting callers raise ``TimeoutError`` after ``timeout`` seconds (the
+        computation itself keeps running), and re-raise the exception if the
+        computation failed.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"Timed out after {timeout}s waiting for in-flight {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared,
+                    'timeouts': self.timeouts, 'in_flight': len(self._calls)}
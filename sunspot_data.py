@@ -0,0 +1,276 @@
+"""
+Sunspot data sources.
+
+The app, the CLI script and the Streamlit app all load their data from here.
+Without a data file they use the built-in 1970-2024 yearly series. Point
+``SUNSPOT_DATA`` (or the ``path`` argument) at a SILSO CSV file instead to
+use the published yearly, monthly or daily total sunspot numbers:
+
+    yearly   SN_y_tot_V2.0.csv  year.5;value;std;n_obs;definitive
+    monthly  SN_m_tot_V2.0.csv  year;month;decimal_date;value;std;n_obs;definitive
+    daily    SN_d_tot_V2.0.csv  year;month;day;decimal_date;value;std;n_obs;definitive
+
+Files are parsed with explicitly typed columns in chunks, and the parsed
+series is cached as a ``.npy`` file next to the source (or in
+``SUNSPOT_DATA_CACHE_DIR``). The cache is keyed on the file's content hash,
+and the hash is only recomputed when the file's size or mtime changes, so
+later loads just memory-map the cached array.
+
+New yearly observations can also be appended while the app runs
+(``append_observations``). Observations for years after the end of the source
+series are added to it by every loader. They are kept in memory, or in the
+append log file named by ``SUNSPOT_APPEND_LOG``, which all workers read and
+which survives restarts. Each line holds ``year;value``. Once the source file
+itself covers a year, its own value wins.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DATA_ENV = 'SUNSPOT_DATA'
+CACHE_DIR_ENV = 'SUNSPOT_DATA_CACHE_DIR'
+APPEND_ENV = 'SUNSPOT_APPEND_LOG'
+DEFAULT_MIN_YEAR = 1970
+CHUNK_ROWS = 50_000
+
+# One row per observation; year/month/day are 0 where the resolution has none
+SERIES_DTYPE = np.dtype([('time', 'f8'), ('value', 'f8'),
+                         ('year', 'i4'), ('month', 'i1'), ('day', 'i1')])
+
+# SILSO column layouts keyed by the number of columns in the file
+_LAYOUTS = {
+    5: ('yearly', ['time', 'value', 'std', 'n_obs', 'definitive']),
+    7: ('monthly', ['year', 'month', 'time', 'value', 'std', 'n_obs', 'definitive']),
+    8: ('daily', ['year', 'month', 'day', 'time', 'value', 'std', 'n_obs', 'definitive']),
+}
+_COLUMN_DTYPES = {'year': np.int32, 'month': np.int8, 'day': np.int8, 'time': np.float64,
+                  'value': np.float64, 'std': np.float64, 'n_obs': np.int32, 'definitive': np.int8}
+
+BUILTIN_YEARS = np.arange(1970, 2025)
+BUILTIN_SUNSPOTS = np.array([
+    104.5, 66.6, 68.9, 38.0, 34.5, 15.5, 12.6, 27.5, 92.5, 155.4,
+    154.6, 140.4, 115.9, 66.6, 45.9, 17.9, 13.4, 29.4, 100.2, 157.6,
+    142.2, 145.8, 94.5, 54.7, 29.9, 17.5, 8.6, 21.6, 64.2, 93.4,
+    119.6, 110.9, 104.1, 63.6, 40.4, 29.8, 15.2, 7.6, 2.9, 3.1,
+    16.5, 55.7, 57.6, 64.7, 79.3, 69.8, 39.8, 28.6, 12.9, 6.2,
+    24.7, 48.8, 78.1, 121.0, 136.0])
+
+_loaded = {}
+_lock = threading.Lock()
+# Appended observations (year -> value) when no append log is configured
+_appended = {}
+# Parsed append log, keyed on (path, size, mtime)
+_appended_log = {}
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _detect_layout(path):
+    with open(path, 'r', encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                n_columns = len(line.split(';'))
+                break
+        else:
+            raise ValueError(f"{path} is empty")
+    if n_columns not in _LAYOUTS:
+        raise ValueError(f"{path} does not look like a SILSO file ({n_columns} columns)")
+    return _LAYOUTS[n_columns]
+
+
+def parse_silso_csv(path, chunk_rows=CHUNK_ROWS):
+    """Parse a SILSO CSV file into a ``SERIES_DTYPE`` array.
+
+    Missing observations (value -1) are dropped.
+    """
+    resolution, columns = _detect_layout(path)
+    parts = []
+    reader = pd.read_csv(path, sep=';', header=None, names=columns, skipinitialspace=True,
+                         dtype={c: _COLUMN_DTYPES[c] for c in columns}, chunksize=chunk_rows)
+    for chunk in reader:
+        chunk = chunk[chunk['value'] >= 0]
+        part = np.zeros(len(chunk), dtype=SERIES_DTYPE)
+        part['time'] = chunk['time'].to_numpy()
+        part['value'] = chunk['value'].to_numpy()
+        if resolution == 'yearly':
+            part['year'] = np.floor(part['time']).astype(np.int32)
+        else:
+            part['year'] = chunk['year'].to_numpy()
+            part['month'] = chunk['month'].to_numpy()
+            if resolution == 'daily':
+                part['day'] = chunk['day'].to_numpy()
+        parts.append(part)
+    if not parts:
+        return np.zeros(0, dtype=SERIES_DTYPE)
+    return np.concatenate(parts)
+
+
+def _cache_paths(path, cache_dir):
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.dirname(path), '.cache')
+    stem = os.path.basename(path)
+    return cache_dir, os.path.join(cache_dir, f'{stem}.meta.json')
+
+
+def load_series(path, cache_dir=None):
+    """Load a SILSO file as a ``SERIES_DTYPE`` array, going through the binary cache"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cache_dir, meta_path = _cache_paths(path, cache_dir)
+
+    meta = None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        pass
+
+    if meta and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        digest = meta['sha256']
+    else:
+        digest = _file_hash(path)
+
+    npy_path = os.path.join(cache_dir, f'{os.path.basename(path)}.{digest[:16]}.npy')
+    if os.path.exists(npy_path):
+        try:
+            series = np.load(npy_path, mmap_mode='r')
+            if series.dtype == SERIES_DTYPE:
+                if not meta or meta.get('mtime_ns') != stat.st_mtime_ns:
+                    _write_meta(meta_path, stat, digest)
+                return series
+        except (OSError, ValueError):
+            pass
+
+    series = parse_silso_csv(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{npy_path}.{os.getpid()}.tmp.npy'
+        np.save(tmp_path, series)
+        os.replace(tmp_path, npy_path)
+        _write_meta(meta_path, stat, digest)
+    except OSError as e:
+        print(f"Could not write data cache: {e}")
+    return series
+
+
+def _write_meta(meta_path, stat, digest):
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}, fh)
+    os.replace(tmp_path, meta_path)
+
+
+def yearly_means(series):
+    """Average a series of any resolution into ``(years, values)`` per calendar year"""
+    years = np.asarray(series['year'])
+    values = np.asarray(series['value'])
+    if len(years) == 0:
+        return years, values
+    first = years.min()
+    sums = np.bincount(years - first, weights=values)
+    counts = np.bincount(years - first)
+    present = counts > 0
+    return np.flatnonzero(present) + first, sums[present] / counts[present]
+
+
+def load_yearly(path=None, min_year=DEFAULT_MIN_YEAR):
+    """Yearly ``(years, values)`` arrays from ``path``, ``$SUNSPOT_DATA`` or the built-in series.
+
+    Parsed files are kept in memory until their size or mtime changes.
+    """
+    path = path or os.environ.get(DATA_ENV)
+    if not path:
+        years, values = BUILTIN_YEARS, BUILTIN_SUNSPOTS
+    else:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with _lock:
+            cached = _loaded.get(key)
+        if cached is None:
+            cached = yearly_means(load_series(path))
+            with _lock:
+                _loaded.clear()
+                _loaded[key] = cached
+        years, values = cached
+
+    extra_years, extra_values = appended_observations()
+    if len(extra_years):
+        after = extra_years > years[-1] if len(years) else np.ones(len(extra_years), dtype=bool)
+        years = np.concatenate([years, extra_years[after]])
+        values = np.concatenate([values, extra_values[after]])
+
+    if min_year is not None:
+        keep = years >= min_year
+        years, values = years[keep], values[keep]
+    return years, values
+
+
+def _read_append_log(path):
+    observations = {}
+    with open(path, 'r', encoding='utf-8') as fh:
+        for line in fh:
+            fields = line.strip().split(';')
+            if len(fields) != 2:
+                continue
+            try:
+                year, value = int(fields[0]), float(fields[1])
+            except ValueError:
+                continue
+            # Two workers may race to append the same year; the first line wins
+            observations.setdefault(year, value)
+    return observations
+
+
+def appended_observations(path=None):
+    """Appended ``(years, values)`` in year order, from the append log or memory"""
+    path = path or os.environ.get(APPEND_ENV)
+    if not path:
+        with _lock:
+            observations = dict(_appended)
+    else:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            observations = {}
+        else:
+            key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+            with _lock:
+                observations = _appended_log.get(key)
+            if observations is None:
+                observations = _read_append_log(path)
+                with _lock:
+                    _appended_log.clear()
+                    _appended_log[key] = observations
+    years = np.array(sorted(observations), dtype=np.int64)
+    return years, np.array([observations[y] for y in years.tolist()], dtype=np.float64)
+
+
+def append_observations(years, values, path=None):
+    """Record new yearly observations; they are picked up by the next load"""
+    path = path or os.environ.get(APPEND_ENV)
+    if not path:
+        with _lock:
+            for year, value in zip(years, values):
+                _appended.setdefault(int(year), float(value))
+        return
+    lines = ''.join(f'{int(year)};{float(value)!r}\n' for year, value in zip(years, values))
+    # One append-mode write per call, so concurrent writers do not interleave lines
+    with open(path, 'a', encoding='utf-8') as fh:
+        fh.write(lines)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def load_dataset(path=None, min_year=DEFAULT_MIN_YEAR):
+    """Yearly data as a fresh ``Year``/``Sunspot_Number`` DataFrame"""
+    years, values = load_yearly(path, min_year)
+    return pd.DataFrame({'Year': years.astype(np.int64), 'Sunspot_Number': values.astype(np.float64)})
@@ -1,204 +1,383 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+"""
+Command-line sunspot forecasts.
+
+    python sunspot_prediction.py [report] [--plot [PATH]] [--show] [--engine forest|hgb|linear]
+        Train/test R², the 2025-2039 forecast and a solar cycle summary.
+        The chart is only drawn with --plot (saved) or --show (displayed).
+
+    python sunspot_prediction.py batch --cutoffs 2005,2010,2015 --horizons 10,20 \\
+            --n-estimators 50,100 --engines forest,linear --jobs 4 --output nightly.csv
+        Runs every combination of training cutoff, horizon, engine and model setting
+        (or the scenarios listed in a --scenarios JSON file) in a process
+        pool. The features are computed once and every worker reuses them.
+        Rows are written as each scenario finishes, to CSV (default: stdout)
+        or Parquet (needs pyarrow). --plot-dir saves one chart per scenario.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from engines import ENGINES, engine_params, fit_engine
+from features import FEATURE_COLUMNS, create_features, feature_matrix
+from models import MODEL_PARAMS
+from rollout import model_predictor, rollout
+from sunspot_data import load_dataset, load_yearly
 warnings.filterwarnings('ignore')
 
-# Historical sunspot data
-data = {
-    'Year': [1970, 1971, 1972, 1973, 1974, 1975, 1976, 1977, 1978, 1979,
-             1980, 1981, 1982, 1983, 1984, 1985, 1986, 1987, 1988, 1989,
-             1990, 1991, 1992, 1993, 1994, 1995, 1996, 1997, 1998, 1999,
-             2000, 2001, 2002, 2003, 2004, 2005, 2006, 2007, 2008, 2009,
-             2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019,
-             2020, 2021, 2022, 2023, 2024],
-    'Sunspot_Number': [104.5, 66.6, 68.9, 38.0, 34.5, 15.5, 12.6, 27.5, 92.5, 155.4,
-                       154.6, 140.4, 115.9, 66.6, 45.9, 17.9, 13.4, 29.4, 100.2, 157.6,
-                       142.2, 145.8, 94.5, 54.7, 29.9, 17.5, 8.6, 21.6, 64.2, 93.4,
-                       119.6, 110.9, 104.1, 63.6, 40.4, 29.8, 15.2, 7.6, 2.9, 3.1,
-                       16.5, 55.7, 57.6, 64.7, 79.3, 69.8, 39.8, 28.6, 12.9, 6.2,
-                       24.7, 48.8, 78.1, 121.0, 136.0]
-}
-
-# Create DataFrame
-df = pd.DataFrame(data)
-
-# Feature engineering for solar cycle pattern (11-year cycle)
-df['Cycle_Position'] = (df['Year'] - 1970) % 11
-df['Years_Since_1970'] = df['Year'] - 1970
-df['Cycle_Number'] = ((df['Year'] - 1970) // 11).astype(int)
-
-# Create features for prediction
-def create_features(df):
-    """Create features for time series prediction"""
-    df_features = df.copy()
-    
-    # Lag features (previous years)
-    for lag in [1, 2, 3, 4, 5]:
-        df_features[f'Lag_{lag}'] = df_features['Sunspot_Number'].shift(lag)
-    
-    # Moving averages
-    df_features['MA_3'] = df_features['Sunspot_Number'].rolling(window=3, min_periods=1).mean()
-    df_features['MA_5'] = df_features['Sunspot_Number'].rolling(window=5, min_periods=1).mean()
-    df_features['MA_11'] = df_features['Sunspot_Number'].rolling(window=11, min_periods=1).mean()
-    
-    # Cycle-based features
-    df_features['Sin_Cycle'] = np.sin(2 * np.pi * df_features['Cycle_Position'] / 11)
-    df_features['Cos_Cycle'] = np.cos(2 * np.pi * df_features['Cycle_Position'] / 11)
-    
-    # Trend
-    df_features['Trend'] = df_features['Years_Since_1970']
-    
-    return df_features
-
-df_features = create_features(df)
-
-# Prepare data for training (remove NaN rows from lag features)
-train_data = df_features.dropna()
-X = train_data[['Cycle_Position', 'Years_Since_1970', 'Cycle_Number', 
-                'Lag_1', 'Lag_2', 'Lag_3', 'Lag_4', 'Lag_5',
-                'MA_3', 'MA_5', 'MA_11',
-                'Sin_Cycle', 'Cos_Cycle', 'Trend']]
-y = train_data['Sunspot_Number']
-
-# Split data (use last 10 years for validation)
-split_idx = len(train_data) - 10
-X_train, X_test = X[:split_idx], X[split_idx:]
-y_train, y_test = y[:split_idx], y[split_idx:]
-
-# Train Random Forest model
-rf_model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
-rf_model.fit(X_train, y_train)
-
-# Evaluate model
-train_score = rf_model.score(X_train, y_train)
-test_score = rf_model.score(X_test, y_test)
-print(f"Model Training Score (R²): {train_score:.4f}")
-print(f"Model Test Score (R²): {test_score:.4f}")
+BATCH_COLUMNS = ['scenario', 'cutoff', 'horizon', 'params', 'year', 'predicted', 'actual', 'error']
+
 
 # Function to predict future years
 def predict_future_years(model, last_data, start_year, end_year):
     """Predict sunspot numbers for future years"""
-    predictions = []
-    current_data = last_data.copy()
-    
-    for year in range(start_year, end_year + 1):
-        # Create features for this year
-        cycle_pos = (year - 1970) % 11
-        years_since = year - 1970
-        cycle_num = (year - 1970) // 11
-        
-        # Use recent predictions/last known values for lags
-        lag_values = current_data['Sunspot_Number'].tail(5).values[::-1]
-        
-        # Calculate moving averages
-        ma_3 = current_data['Sunspot_Number'].tail(3).mean()
-        ma_5 = current_data['Sunspot_Number'].tail(5).mean()
-        ma_11 = current_data['Sunspot_Number'].tail(11).mean() if len(current_data) >= 11 else current_data['Sunspot_Number'].mean()
-        
-        # Cycle features
-        sin_cycle = np.sin(2 * np.pi * cycle_pos / 11)
-        cos_cycle = np.cos(2 * np.pi * cycle_pos / 11)
-        
-        # Create feature vector
-        features = np.array([[
-            cycle_pos, years_since, cycle_num,
-            lag_values[0] if len(lag_values) > 0 else current_data['Sunspot_Number'].iloc[-1],
-            lag_values[1] if len(lag_values) > 1 else current_data['Sunspot_Number'].iloc[-1],
-            lag_values[2] if len(lag_values) > 2 else current_data['Sunspot_Number'].iloc[-1],
-            lag_values[3] if len(lag_values) > 3 else current_data['Sunspot_Number'].iloc[-1],
-            lag_values[4] if len(lag_values) > 4 else current_data['Sunspot_Number'].iloc[-1],
-            ma_3, ma_5, ma_11,
-            sin_cycle, cos_cycle, years_since
-        ]])
-        
-        # Predict
-        pred = model.predict(features)[0]
-        predictions.append({'Year': year, 'Sunspot_Number': max(0, pred)})  # Ensure non-negative
-        
-        # Update current_data for next iteration
-        new_row = pd.DataFrame({'Year': [year], 'Sunspot_Number': [pred]})
-        current_data = pd.concat([current_data, new_row], ignore_index=True)
-    
-    return pd.DataFrame(predictions)
-
-# Predict next 15 years (2025-2039)
-future_predictions = predict_future_years(rf_model, df_features, 2025, 2039)
-
-print("\n" + "="*60)
-print("PREDICTIONS FOR FUTURE YEARS (2025-2039)")
-print("="*60)
-print(future_predictions.to_string(index=False))
-
-# Combine historical and predicted data for visualization
-all_data = pd.concat([df[['Year', 'Sunspot_Number']], future_predictions], ignore_index=True)
-all_data['Type'] = ['Historical'] * len(df) + ['Predicted'] * len(future_predictions)
-
-# Create visualization
-plt.figure(figsize=(16, 8))
-
-# Plot historical data
-historical = all_data[all_data['Type'] == 'Historical']
-predicted = all_data[all_data['Type'] == 'Predicted']
-
-plt.plot(historical['Year'], historical['Sunspot_Number'], 
-         'o-', color='#2E86AB', linewidth=2, markersize=6, 
-         label='Historical Data', alpha=0.8)
-
-# Plot predictions
-plt.plot(predicted['Year'], predicted['Sunspot_Number'], 
-         's--', color='#A23B72', linewidth=2, markersize=5, 
-         label='Predicted Data', alpha=0.8)
-
-# Add vertical lines for 11-year cycle markers
-cycle_start_year = 1970
-for i in range(0, 8):  # Mark cycles from 1970 to ~2050
-    cycle_year = cycle_start_year + i * 11
-    if cycle_year <= 2039:
-        plt.axvline(x=cycle_year, color='gray', linestyle=':', 
-                   alpha=0.5, linewidth=1)
-        if cycle_year >= 1970:
-            plt.text(cycle_year, plt.ylim()[1] * 0.95, 
-                    f'Cycle {i}', rotation=90, 
-                    verticalalignment='top', fontsize=8, alpha=0.7)
-
-# Highlight the 11-year cycle pattern
-plt.axhline(y=0, color='black', linestyle='-', linewidth=0.5, alpha=0.3)
-
-# Formatting
-plt.xlabel('Year', fontsize=12, fontweight='bold')
-plt.ylabel('Sunspot Number', fontsize=12, fontweight='bold')
-plt.title('Sunspot Number Prediction Model (1970-2039)\n11-Year Solar Cycle Pattern', 
-          fontsize=14, fontweight='bold', pad=20)
-plt.grid(True, alpha=0.3, linestyle='--')
-plt.legend(loc='upper left', fontsize=10, framealpha=0.9)
-
-# Add text annotation about solar cycle
-plt.text(0.02, 0.98, 
-         'Vertical dotted lines mark 11-year solar cycle boundaries',
-         transform=plt.gca().transAxes,
-         fontsize=9, verticalalignment='top',
-         bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-plt.tight_layout()
-plt.savefig('sunspot_prediction.png', dpi=300, bbox_inches='tight')
-print("\n" + "="*60)
-print("Graph saved as 'sunspot_prediction.png'")
-print("="*60)
-
-# Display the plot
-plt.show()
-
-# Print cycle analysis
-print("\n" + "="*60)
-print("SOLAR CYCLE ANALYSIS")
-print("="*60)
-print(f"Average cycle length: ~11 years")
-print(f"Peak years observed: 1979-1980, 1989-1990, 2000-2001, 2013-2014, 2023-2024")
-print(f"Minimum years observed: 1976, 1986, 1996, 2008-2009, 2019")
-print(f"\nNext predicted peak: ~{future_predictions.loc[future_predictions['Sunspot_Number'].idxmax(), 'Year']}")
-print(f"Next predicted minimum: ~{future_predictions.loc[future_predictions['Sunspot_Number'].idxmin(), 'Year']}")
+    years, values = rollout(model_predictor(model), last_data['Sunspot_Number'].to_numpy(),
+                            start_year, end_year)
+    return pd.DataFrame({'Year': years, 'Sunspot_Number': values})
+
+
+def plot_report(df, future_predictions, path=None, show=False):
+    """The report chart: history, forecast and 11-year cycle markers"""
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    # Combine historical and predicted data for visualization
+    all_data = pd.concat([df[['Year', 'Sunspot_Number']], future_predictions], ignore_index=True)
+    all_data['Type'] = ['Historical'] * len(df) + ['Predicted'] * len(future_predictions)
+
+    # Create visualization
+    plt.figure(figsize=(16, 8))
+
+    # Plot historical data
+    historical = all_data[all_data['Type'] == 'Historical']
+    predicted = all_data[all_data['Type'] == 'Predicted']
+
+    plt.plot(historical['Year'], historical['Sunspot_Number'],
+             'o-', color='#2E86AB', linewidth=2, markersize=6,
+             label='Historical Data', alpha=0.8)
+
+    # Plot predictions
+    plt.plot(predicted['Year'], predicted['Sunspot_Number'],
+             's--', color='#A23B72', linewidth=2, markersize=5,
+             label='Predicted Data', alpha=0.8)
+
+    # Add vertical lines for 11-year cycle markers
+    cycle_start_year = 1970
+    for i in range(0, 8):  # Mark cycles from 1970 to ~2050
+        cycle_year = cycle_start_year + i * 11
+        if cycle_year <= 2039:
+            plt.axvline(x=cycle_year, color='gray', linestyle=':',
+                       alpha=0.5, linewidth=1)
+            if cycle_year >= 1970:
+                plt.text(cycle_year, plt.ylim()[1] * 0.95,
+                        f'Cycle {i}', rotation=90,
+                        verticalalignment='top', fontsize=8, alpha=0.7)
+
+    # Highlight the 11-year cycle pattern
+    plt.axhline(y=0, color='black', linestyle='-', linewidth=0.5, alpha=0.3)
+
+    # Formatting
+    plt.xlabel('Year', fontsize=12, fontweight='bold')
+    plt.ylabel('Sunspot Number', fontsize=12, fontweight='bold')
+    plt.title('Sunspot Number Prediction Model (1970-2039)\n11-Year Solar Cycle Pattern',
+              fontsize=14, fontweight='bold', pad=20)
+    plt.grid(True, alpha=0.3, linestyle='--')
+    plt.legend(loc='upper left', fontsize=10, framealpha=0.9)
+
+    # Add text annotation about solar cycle
+    plt.text(0.02, 0.98,
+             'Vertical dotted lines mark 11-year solar cycle boundaries',
+             transform=plt.gca().transAxes,
+             fontsize=9, verticalalignment='top',
+             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+    plt.tight_layout()
+    if path:
+        plt.savefig(path, dpi=300, bbox_inches='tight')
+        print("\n" + "="*60)
+        print(f"Graph saved as '{path}'")
+        print("="*60)
+
+    # Display the plot
+    if show:
+        plt.show()
+    plt.close('all')
+
+
+def report(plot=None, show=False, engine='forest'):
+    """Train on all but the last 10 years, print scores, the forecast and a cycle summary"""
+    # Historical sunspot data
+    df = load_dataset()
+
+    # Feature engineering for solar cycle pattern (11-year cycle)
+    df_features = create_features(df)
+
+    # Prepare data for training (remove NaN rows from lag features)
+    train_data = df_features.dropna()
+    X = train_data[FEATURE_COLUMNS]
+    y = train_data['Sunspot_Number']
+
+    # Split data (use last 10 years for validation)
+    split_idx = len(train_data) - 10
+    X_train, X_test = X[:split_idx], X[split_idx:]
+    y_train, y_test = y[:split_idx], y[split_idx:]
+
+    # Train the model (the Random Forest unless another engine is chosen)
+    rf_model = fit_engine(X_train.to_numpy(), y_train.to_numpy(), engine_params(engine))
+
+    # Evaluate model
+    train_score = rf_model.score(X_train, y_train)
+    test_score = rf_model.score(X_test, y_test)
+    print(f"Model Training Score (R²): {train_score:.4f}")
+    print(f"Model Test Score (R²): {test_score:.4f}")
+    if engine != 'forest':
+        print(f"Engine: {engine} (fitted in {rf_model.fit_seconds * 1e3:.2f} ms)")
+
+    # Predict next 15 years (2025-2039)
+    future_predictions = predict_future_years(rf_model, df_features, 2025, 2039)
+
+    print("\n" + "="*60)
+    print("PREDICTIONS FOR FUTURE YEARS (2025-2039)")
+    print("="*60)
+    print(future_predictions.to_string(index=False))
+
+    if plot or show:
+        plot_report(df, future_predictions, plot, show)
+
+    # Print cycle analysis
+    print("\n" + "="*60)
+    print("SOLAR CYCLE ANALYSIS")
+    print("="*60)
+    print(f"Average cycle length: ~11 years")
+    print(f"Peak years observed: 1979-1980, 1989-1990, 2000-2001, 2013-2014, 2023-2024")
+    print(f"Minimum years observed: 1976, 1986, 1996, 2008-2009, 2019")
+    print(f"\nNext predicted peak: ~{future_predictions.loc[future_predictions['Sunspot_Number'].idxmax(), 'Year']}")
+    print(f"Next predicted minimum: ~{future_predictions.loc[future_predictions['Sunspot_Number'].idxmin(), 'Year']}")
+
+
+# Per-process copy of the series and feature matrix, set once by _init_worker
+_shared = {}
+
+
+def _init_worker(years, values, X):
+    _shared.update(years=years, values=values, X=X)
+
+
+def run_scenario(years, values, X, scenario):
+    """Fit on years <= cutoff and forecast ``horizon`` years past it.
+
+    Returns ``(years, predicted, actual)``; ``actual`` is NaN where the
+    series has no observation.
+    """
+    cutoff, horizon = scenario['cutoff'], scenario['horizon']
+    train = (years <= cutoff) & ~np.isnan(X).any(axis=1)
+    if not train.any():
+        raise ValueError(f"No training data up to {cutoff}")
+    model = fit_engine(X[train], values[train], scenario['params'])
+    n_history = int(np.searchsorted(years, cutoff, side='right'))
+    pred_years, predicted = rollout(model_predictor(model), values[:n_history], cutoff + 1, cutoff + horizon)
+    observed = dict(zip(years.tolist(), values.tolist()))
+    actual = np.array([observed.get(int(y), np.nan) for y in pred_years])
+    return pred_years, predicted, actual
+
+
+def _run_shared(scenario):
+    return scenario, run_scenario(_shared['years'], _shared['values'], _shared['X'], scenario)
+
+
+def scenario_grid(cutoffs, horizons, param_grid, engines=('forest',)):
+    """Every combination of cutoff, horizon, engine and ``param_grid`` values, numbered from 0.
+
+    ``param_grid`` only applies to the forest; other engines use their defaults.
+    """
+    names = list(param_grid)
+    settings = [dict(MODEL_PARAMS, **dict(zip(names, values)))
+                for values in itertools.product(*(param_grid[n] for n in names))]
+    models = [params for engine in engines
+              for params in (settings if engine == 'forest' else [engine_params(engine)])]
+    scenarios = []
+    for cutoff, horizon, params in itertools.product(cutoffs, horizons, models):
+        scenarios.append({'cutoff': int(cutoff), 'horizon': int(horizon), 'params': dict(params)})
+    for i, scenario in enumerate(scenarios):
+        scenario['scenario'] = i
+    return scenarios
+
+
+def load_scenarios(path, default_cutoff, default_horizon):
+    """Scenarios from a JSON list of ``{"cutoff", "horizon", "engine", <model params>...}`` objects"""
+    with open(path, 'r', encoding='utf-8') as fh:
+        raw = json.load(fh)
+    scenarios = []
+    for i, item in enumerate(raw):
+        item = dict(item)
+        cutoff = int(item.pop('cutoff', default_cutoff))
+        horizon = int(item.pop('horizon', default_horizon))
+        name = item.pop('scenario', i)
+        engine = item.get('engine', 'forest')
+        scenarios.append({'scenario': name, 'cutoff': cutoff, 'horizon': horizon,
+                          'params': dict(engine_params(engine), **item)})
+    return scenarios
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self._fh = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(BATCH_COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._fh.flush()
+
+    def close(self):
+        if self._fh is not sys.stdout:
+            self._fh.close()
+
+
+class _ParquetSink:
+    """One row group per scenario, so finished scenarios are on disk straight away"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([('scenario', pa.string()), ('cutoff', pa.int64()), ('horizon', pa.int64()),
+                                  ('params', pa.string()), ('year', pa.int64()), ('predicted', pa.float64()),
+                                  ('actual', pa.float64()), ('error', pa.float64())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in BATCH_COLUMNS]
+        arrays = {name: list(col) for name, col in zip(BATCH_COLUMNS, columns)}
+        arrays['scenario'] = [str(s) for s in arrays['scenario']]
+        self._writer.write_table(self._pa.table(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def _rows(scenario, pred_years, predicted, actual):
+    params = json.dumps(scenario['params'], sort_keys=True)
+    return [[scenario['scenario'], scenario['cutoff'], scenario['horizon'], params, int(year),
+             float(p), None if np.isnan(a) else float(a), None if np.isnan(a) else float(p - a)]
+            for year, p, a in zip(pred_years, predicted, actual)]
+
+
+def run_batch(scenarios, output='-', n_jobs=1, plot_dir=None, data=None):
+    """Run ``scenarios`` and stream their rows to ``output`` as each one finishes"""
+    years, values = load_yearly(data)
+    X = feature_matrix(years, values)
+    sink = _ParquetSink(output) if output.endswith('.parquet') else _CsvSink(output)
+    if plot_dir:
+        from charts import render_chart
+        os.makedirs(plot_dir, exist_ok=True)
+        history = pd.DataFrame({'Year': years, 'Sunspot_Number': values})
+
+    def finished(scenario, result):
+        sink.write(_rows(scenario, *result))
+        if plot_dir:
+            pred_years, predicted, _ = result
+            future = pd.DataFrame({'Year': pred_years, 'Sunspot_Number': predicted})
+            end_year = int(pred_years[-1]) if len(pred_years) else scenario['cutoff']
+            png = render_chart('png-lite', history[history['Year'] <= scenario['cutoff']], future, end_year)
+            with open(os.path.join(plot_dir, f"scenario-{scenario['scenario']}.png"), 'wb') as fh:
+                fh.write(png)
+
+    try:
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(years, values, X)) as pool:
+                for future in as_completed([pool.submit(_run_shared, s) for s in scenarios]):
+                    finished(*future.result())
+        else:
+            for scenario in scenarios:
+                finished(scenario, run_scenario(years, values, X, scenario))
+    finally:
+        sink.close()
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+def _param_list(text):
+    """Comma-separated forest parameter values: ints, floats, 'none' or strings"""
+    values = []
+    for raw in (v.strip() for v in text.split(',') if v.strip()):
+        if raw.lower() == 'none':
+            values.append(None)
+            continue
+        for cast in (int, float):
+            try:
+                values.append(cast(raw))
+                break
+            except ValueError:
+                pass
+        else:
+            values.append(raw)
+    return values
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in ('report', 'batch', '-h', '--help'):
+        argv.insert(0, 'report')
+
+    parser = argparse.ArgumentParser(description='Sunspot number forecasts from the command line')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = commands.add_parser('report', help='scores, the 2025-2039 forecast and a cycle summary')
+    report_parser.add_argument('--plot', nargs='?', const='sunspot_prediction.png',
+                               help='save the chart (default file: sunspot_prediction.png)')
+    report_parser.add_argument('--show', action='store_true', help='display the chart in a window')
+    report_parser.add_argument('--engine', choices=list(ENGINES), default='forest', help='model engine')
+
+    batch = commands.add_parser('batch', help='run many forecast scenarios in parallel')
+    batch.add_argument('--data', help='SILSO CSV file (default: $SUNSPOT_DATA or the built-in series)')
+    batch.add_argument('--scenarios', help='JSON list of scenario objects instead of the grid options')
+    batch.add_argument('--cutoffs', type=_int_list, help='last training years (default: last data year)')
+    batch.add_argument('--horizons', type=_int_list, default=[15], help='years to forecast past each cutoff')
+    batch.add_argument('--engines', type=lambda text: [e for e in text.split(',') if e.strip()],
+                       default=['forest'], help=f"model engines to try ({', '.join(ENGINES)})")
+    batch.add_argument('--n-estimators', type=_param_list, help='forest sizes to try')
+    batch.add_argument('--max-depth', type=_param_list, help='tree depths to try ("none" for unlimited)')
+    batch.add_argument('--min-samples-leaf', type=_param_list, help='minimum leaf sizes to try')
+    batch.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    batch.add_argument('--output', default='-', help='CSV file, .parquet file, or - for stdout')
+    batch.add_argument('--plot-dir', help='also save one chart per scenario in this directory')
+    args = parser.parse_args(argv)
+
+    if args.command == 'report':
+        report(plot=args.plot, show=args.show, engine=args.engine)
+        return
+
+    last_year = int(load_yearly(args.data)[0][-1])
+    if args.scenarios:
+        scenarios = load_scenarios(args.scenarios, last_year, args.horizons[0])
+    else:
+        param_grid = {name: values for name, values in (('n_estimators', args.n_estimators),
+                                                        ('max_depth', args.max_depth),
+                                                        ('min_samples_leaf', args.min_samples_leaf))
+                      if values}
+        unknown = [e for e in args.engines if e not in ENGINES]
+        if unknown:
+            parser.error(f"unknown engine(s) {', '.join(unknown)}; choose from {', '.join(ENGINES)}")
+        scenarios = scenario_grid(args.cutoffs or [last_year], args.horizons, param_grid, args.engines)
+    run_batch(scenarios, output=args.output, n_jobs=args.jobs, plot_dir=args.plot_dir, data=args.data)
+    print(f"{len(scenarios)} scenarios written to {args.output}", file=sys.stderr)
+
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Hyperparameter sweep over forest settings, scored on accuracy *and* latency.
+
+Every configuration is backtested with rolling origins (see ``backtest.py``)
+for forecast error. It is then refitted on all data and timed on single-row
+predictions, because the rollout makes one prediction call per forecast year.
+The result table marks the Pareto front: configurations that no other
+configuration beats on both error and latency.
+
+Configurations run in parallel. The feature matrix is written once to a
+``.npy`` file, a chunk at a time, and every worker memory-maps that same file
+instead of receiving its own copy.
+
+Usage:
+    python sweep.py [--samples 20] [--jobs 4] [--output sweep.csv]
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import backtest_origins, evaluate_fold
+from engines import median_seconds
+from features import FEATURE_COLUMNS, iter_feature_chunks
+from flat_forest import FlatForest
+from models import fit_forest
+from sunspot_data import load_yearly
+
+GRID = {
+    'n_estimators': [10, 25, 50, 100, 200],
+    'max_depth': [3, 5, 8, 10, None],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+
+_shared = {}
+
+
+def _init_worker(matrix_path, years, values):
+    _shared.update(X=np.load(matrix_path, mmap_mode='r'), years=years, values=values)
+
+
+def _evaluate(config, origins, horizon, latency_repeat):
+    X, years, values = _shared['X'], _shared['years'], _shared['values']
+    params = dict(config, random_state=42)
+    rows = np.vstack([evaluate_fold(years, values, X, params, origin, horizon) for origin in origins])
+    errors = rows[:, 4] - rows[:, 3]
+
+    complete = ~np.isnan(X).any(axis=1)
+    start = time.perf_counter()
+    model = fit_forest(X[complete], values[complete], params)
+    fit_seconds = time.perf_counter() - start
+    flat = FlatForest.from_sklearn(model)
+    row = np.array(X[-1:], dtype=np.float64)
+
+    return dict(config,
+                mae=float(np.abs(errors).mean()),
+                rmse=float(np.sqrt((errors ** 2).mean())),
+                fit_ms=fit_seconds * 1e3,
+                predict_us=median_seconds(lambda: flat.predict_one(row), latency_repeat) * 1e6,
+                sklearn_predict_us=median_seconds(lambda: model.predict(row), latency_repeat) * 1e6,
+                nodes=len(flat.value))
+
+
+def _evaluate_batch(configs, origins, horizon, latency_repeat):
+    return [_evaluate(config, origins, horizon, latency_repeat) for config in configs]
+
+
+def sweep_configs(grid=GRID, samples=None, seed=0):
+    """Every combination of ``grid``, or ``samples`` of them drawn at random"""
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if samples is not None and samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+    return configs
+
+
+def pareto_front(results, objectives=('mae', 'predict_us')):
+    """Boolean mask of rows not dominated on every objective (lower is better)"""
+    points = results[list(objectives)].to_numpy()
+    front = np.ones(len(points), dtype=bool)
+    for i, point in enumerate(points):
+        dominated = np.all(points <= point, axis=1) & np.any(points < point, axis=1)
+        front[i] = not dominated.any()
+    return front
+
+
+def run_sweep(years, values, configs, horizon=10, min_train=20, step=3, n_jobs=1, latency_repeat=200):
+    """Evaluate ``configs``; returns one row per configuration with a ``pareto`` flag"""
+    years = np.asarray(years, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    origins = backtest_origins(years, min_train, step)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix_path = os.path.join(tmp, 'features.npy')
+        X = np.lib.format.open_memmap(matrix_path, mode='w+', dtype=np.float64,
+                                      shape=(len(values), len(FEATURE_COLUMNS)))
+        for start, block in iter_feature_chunks(years, values):
+            X[start:start + len(block)] = block
+        X.flush()
+        del X
+
+        if n_jobs > 1:
+            batches = [b for b in (configs[i::n_jobs] for i in range(n_jobs)) if b]
+            with ProcessPoolExecutor(max_workers=len(batches), initializer=_init_worker,
+                                     initargs=(matrix_path, years, values)) as pool:
+                futures = [pool.submit(_evaluate_batch, b, origins, horizon, latency_repeat) for b in batches]
+                rows = [row for future in futures for row in future.result()]
+        else:
+            _init_worker(matrix_path, years, values)
+            rows = _evaluate_batch(configs, origins, horizon, latency_repeat)
+            _shared.clear()
+
+    results = pd.DataFrame(rows)
+    results['pareto'] = pareto_front(results)
+    return results.sort_values(['pareto', 'mae'], ascending=[False, True]).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep forest settings for forecast error and latency')
+    parser.add_argument('--data', help='SILSO CSV file (default: $SUNSPOT_DATA or the built-in series)')
+    parser.add_argument('--samples', type=int, help='random sample of the grid instead of all of it')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--horizon', type=int, default=10, help='years to forecast from each origin')
+    parser.add_argument('--min-train', type=int, default=20, help='years of data before the first origin')
+    parser.add_argument('--step', type=int, default=3, help='years between backtest origins')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--output', help='write the full result table to this CSV file')
+    args = parser.parse_args(argv)
+
+    years, values = load_yearly(args.data)
+    configs = sweep_configs(samples=args.samples, seed=args.seed)
+    results = run_sweep(years, values, configs, horizon=args.horizon, min_train=args.min_train,
+                        step=args.step, n_jobs=args.jobs)
+    if args.output:
+        results.to_csv(args.output, index=False)
+    print(f"{len(results)} configurations, {int(results['pareto'].sum())} on the Pareto front:\n")
+    print(results[results['pareto']].to_string(index=False, float_format=lambda v: f'{v:.2f}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Prediction intervals from the spread of the forest's trees.
+
+The mean forecast rolls the averaged prediction forward. Here every tree rolls
+its *own* trajectory forward instead, feeding its own predictions back as
+lags, and the per-year percentiles across trees form the band. All trees are
+advanced together: each step builds one feature row per tree and walks every
+tree on its own row with ``FlatForest.predict_each``, so the cost is one
+vectorised step per year, not one rollout per tree. Large forests can also be
+split across a process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rollout import CYCLE_LENGTH, CYCLE_ORIGIN, N_FEATURES, N_LAGS, WINDOW
+
+BAND_PERCENTILES = (5, 50, 95)
+
+
+def tree_trajectories(forest, history, start_year, end_year):
+    """Roll every tree of ``forest`` forward; returns ``(years, values)`` with
+    ``values`` shaped ``(n_trees, n_years)`` and clipped at zero"""
+    history = np.asarray(history, dtype=np.float64)[-WINDOW:]
+    if history.size == 0:
+        raise ValueError("Trajectories need at least one observed value")
+    n_hist = len(history)
+    n_years = max(0, end_year - start_year + 1)
+    n_trees = forest.n_trees
+
+    # Observed values followed by each tree's own predictions
+    trajectory = np.empty((n_trees, n_hist + n_years), dtype=np.float64)
+    trajectory[:, :n_hist] = history
+    X = np.empty((n_trees, N_FEATURES), dtype=np.float64)
+
+    for step in range(n_years):
+        year = start_year + step
+        pos = n_hist + step
+        count = min(pos, WINDOW)
+        window = trajectory[:, pos - count:pos]
+        offset = year - CYCLE_ORIGIN
+        cycle_pos = offset % CYCLE_LENGTH
+
+        X[:, 0] = cycle_pos
+        X[:, 1] = offset
+        X[:, 2] = offset // CYCLE_LENGTH
+        for lag in range(N_LAGS):
+            X[:, 3 + lag] = window[:, -1 - lag] if count > lag else window[:, -1]
+        X[:, 8] = window[:, -3:].sum(axis=1) / min(count, 3)
+        X[:, 9] = window[:, -5:].sum(axis=1) / min(count, 5)
+        X[:, 10] = window.sum(axis=1) / count
+        X[:, 11] = np.sin(2 * np.pi * cycle_pos / CYCLE_LENGTH)
+        X[:, 12] = np.cos(2 * np.pi * cycle_pos / CYCLE_LENGTH)
+        X[:, 13] = offset
+
+        trajectory[:, pos] = forest.predict_each(X)
+
+    years = np.arange(start_year, start_year + n_years)
+    return years, np.maximum(trajectory[:, n_hist:], 0.0)
+
+
+def _trajectories_for(args):
+    forest, history, start_year, end_year = args
+    return tree_trajectories(forest, history, start_year, end_year)[1]
+
+
+class ForecastBands:
+    """Per-year percentiles of the tree trajectories"""
+
+    def __init__(self, years, percentiles, values):
+        self.years = np.asarray(years)
+        self.percentiles = tuple(percentiles)
+        self.values = np.asarray(values)  # shape (len(percentiles), n_years)
+        self.first_year = int(self.years[0]) if len(self.years) else None
+
+    def slice(self, start_year, end_year):
+        """Years and ``{percentile: values}`` for ``start_year..end_year``, clamped to the band"""
+        if self.first_year is None:
+            return self.years, {p: self.values[i] for i, p in enumerate(self.percentiles)}
+        lo = max(0, start_year - self.first_year)
+        hi = max(lo, min(len(self.years), end_year - self.first_year + 1))
+        return self.years[lo:hi], {p: self.values[i, lo:hi] for i, p in enumerate(self.percentiles)}
+
+    def at(self, year):
+        """``{percentile: value}`` for one year, or None outside the band"""
+        if self.first_year is None:
+            return None
+        i = year - self.first_year
+        if i < 0 or i >= len(self.years):
+            return None
+        return {p: float(self.values[j, i]) for j, p in enumerate(self.percentiles)}
+
+
+def forecast_bands(forest, history, start_year, end_year, percentiles=BAND_PERCENTILES, n_jobs=1):
+    """Percentile bands for ``start_year..end_year``.
+
+    With ``n_jobs > 1`` the trees are split into groups that are rolled
+    forward in separate processes; the result is the same either way.
+    """
+    if n_jobs > 1 and forest.n_trees > 1:
+        groups = np.array_split(np.arange(forest.n_trees), min(n_jobs, forest.n_trees))
+        tasks = [(forest.subset(group), history, start_year, end_year) for group in groups]
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            trajectories = np.vstack(list(pool.map(_trajectories_for, tasks)))
+        years = np.arange(start_year, start_year + trajectories.shape[1])
+    else:
+        years, trajectories = tree_trajectories(forest, history, start_year, end_year)
+    return ForecastBands(years, percentiles, np.percentile(trajectories, percentiles, axis=0))